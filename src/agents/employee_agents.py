@@ -62,7 +62,11 @@ class EmployeeAgents:
             verbose=True,
             allow_delegation=False,
             llm=self.llm,
-            tools=[self.library_tools.search_library]
+            tools=[
+                self.library_tools.search_library,
+                self.library_tools.search_library_batch,
+                self.library_tools.get_book_details
+            ]
         )
     
     def create_organization_assistant(self):
@@ -73,7 +77,9 @@ class EmployeeAgents:
             backstory=config.get("backstory", "You organize information"),
             verbose=True,
             allow_delegation=False,
-            llm=self.llm
+            llm=self.llm,
+            # Compact search results carry truncated summaries; full records are fetched on demand
+            tools=[self.library_tools.get_book_details]
         )
     
     def create_collection_assistant(self):
@@ -85,7 +91,8 @@ class EmployeeAgents:
             verbose=True,
             allow_delegation=False,
             llm=self.llm,
-            tools=[self.library_tools.check_book_exists, self.library_tools.add_to_library]
+            tools=[self.library_tools.check_book_exists, self.library_tools.add_to_library,
+                   self.library_tools.add_books_to_library]
         )
     
     def create_recommendation_assistant(self):
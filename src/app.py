@@ -1,6 +1,59 @@
+import os
 import time
 from main import LibrarySystem
 
+PHASE_TITLES = {
+    "question": "READER QUESTION",
+    "description": "READER DESCRIPTION",
+    "requirements": "REQUIREMENTS ANALYSIS",
+    "demand_analysis": "DEMAND ANALYSIS",
+    "search_results": "CATALOG SEARCH",
+    "organized_results": "ORGANIZED RESULTS",
+    "collection_results": "COLLECTION UPDATES",
+}
+
+
+def print_header(title):
+    print("\n" + "=" * 50)
+    print(f"{title:^50}")
+    print("=" * 50)
+
+
+def render_stream(events, start_time):
+    """Print pipeline events as they arrive and return the final results"""
+    first_output = None
+    streaming = False
+    for event in events:
+        if first_output is None and event["type"] not in ("done", "error"):
+            first_output = time.time() - start_time
+            print(f"\n⏱️ First output after {first_output:.2f} seconds.")
+        
+        if event["type"] == "token":
+            if not streaming:
+                print_header("BOOK RECOMMENDATIONS")
+                streaming = True
+            print(event["content"], end="", flush=True)
+        elif event["type"] == "recommendations":
+            # Already shown token by token when the LLM streamed its answer
+            if streaming:
+                print()
+            else:
+                print_header("BOOK RECOMMENDATIONS")
+                print(event["content"])
+        elif event["type"] in PHASE_TITLES:
+            title = PHASE_TITLES[event["type"]]
+            if "agent" in event:
+                title = f"{title} - {event['agent']}"
+            print_header(title)
+            print(event["content"])
+        elif event["type"] == "error":
+            print(f"\n❌ Error occurred: {event['content']}")
+            print("Please try again with a different topic.")
+            return None
+        elif event["type"] == "done":
+            return event["content"]
+    return None
+
 def main():
     """Main application entry point"""
     print("=" * 50)
@@ -48,20 +101,19 @@ def main():
             print("\nProcessing your request... This may take several minutes.\n")
             
             try:
-                results = library_system.recommend_books(topic)
-                
-                print("\n" + "=" * 50)
-                print("             REQUIREMENTS ANALYSIS             ")
-                print("=" * 50)
-                print(results["requirements"])
-                
-                print("\n" + "=" * 50)
-                print("             BOOK RECOMMENDATIONS              ")
-                print("=" * 50)
-                print(results["recommendations"])
+                results = render_stream(library_system.recommend_books_stream(topic), start_time)
+                if results is None:
+                    continue
                 
                 elapsed_time = time.time() - start_time
                 print(f"\nProcess completed in {elapsed_time:.2f} seconds.")
+                
+                # Set LIBRARY_PROFILE_DIR to keep JSON, OpenMetrics and Chrome-trace profiles of each run
+                profile_dir = os.getenv("LIBRARY_PROFILE_DIR")
+                if profile_dir:
+                    run_id = library_system.profiler.last_run_id()
+                    paths = library_system.profiler.export(profile_dir, run_id, prefix=f"run-{int(start_time)}")
+                    print(f"Profile written to {', '.join(paths.values())}")
             except Exception as e:
                 print(f"\n❌ Error occurred: {str(e)}")
                 print("Please try again with a different topic.")
@@ -0,0 +1,281 @@
+import argparse
+import csv
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from src.main import LibrarySystem
+from src.utils.topic_cache import TopicCache
+from src.utils.llm_transport import AsyncLLMTransport
+
+# Maximum number of LLM calls in flight at once for each backend
+DEFAULT_BACKEND_LIMITS = {"ollama": 1, "openai": 8}
+
+
+def backend_for_model(model_name):
+    """Return the backend a model name is served by, e.g. "ollama/llama3" -> "ollama"."""
+    return model_name.split("/", 1)[0] if "/" in model_name else "openai"
+
+
+def load_topics(file_path):
+    """Read topics from a JSONL, CSV or plain text file, dropping duplicates."""
+    topics = []
+    if file_path.endswith(".jsonl"):
+        with open(file_path, "r", encoding="utf-8") as file:
+            for line in file:
+                line = line.strip()
+                if not line:
+                    continue
+                record = json.loads(line)
+                topics.append(record["topic"] if isinstance(record, dict) else str(record))
+    elif file_path.endswith(".csv"):
+        with open(file_path, "r", encoding="utf-8", newline="") as file:
+            reader = csv.DictReader(file)
+            column = "topic" if "topic" in (reader.fieldnames or []) else reader.fieldnames[0]
+            topics = [row[column] for row in reader]
+    else:
+        with open(file_path, "r", encoding="utf-8") as file:
+            topics = [line for line in file]
+
+    topics = [topic.strip() for topic in topics if topic and topic.strip()]
+    return list(dict.fromkeys(topics))
+
+
+def load_checkpoint(output_path):
+    """Return the topics that already have a result in the output file.
+
+    Records with status "error" do not count, so topics that failed (e.g.
+    during a backend outage) are run again on resume."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, "r", encoding="utf-8") as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+                if record.get("status") == "error":
+                    done.discard(record["topic"])
+                else:
+                    done.add(record["topic"])
+            except (ValueError, KeyError, TypeError, AttributeError):
+                # A line cut short by a crash; the topic is simply run again
+                continue
+    return done
+
+
+class BackendLimiter:
+    """Caps the number of concurrent LLM calls per backend across all workers."""
+
+    def __init__(self, limits=None):
+        self.limits = dict(DEFAULT_BACKEND_LIMITS)
+        self.limits.update(limits or {})
+        self._semaphores = {}
+        self._lock = threading.Lock()
+
+    def _semaphore(self, backend):
+        with self._lock:
+            if backend not in self._semaphores:
+                limit = self.limits.get(backend, max(self.limits.values()))
+                self._semaphores[backend] = threading.BoundedSemaphore(limit)
+            return self._semaphores[backend]
+
+    def install(self, llm, backend=None):
+        """Wrap llm.call so every agent sharing this LLM respects the backend limit.
+
+        The backend defaults to the one serving llm.model."""
+        semaphore = self._semaphore(backend or backend_for_model(getattr(llm, "model", "") or ""))
+        original_call = llm.call
+
+        def limited_call(*args, **kwargs):
+            with semaphore:
+                return original_call(*args, **kwargs)
+
+        llm.call = limited_call
+        return llm
+
+
+class BatchRecommender:
+    """Runs recommend_books for many topics on a shared worker pool and
+    streams each result to a JSONL file as soon as it finishes."""
+
+    def __init__(self, model_name="ollama/llama3", workers=4, backend_limits=None, library_system=None,
+                 llm_cache_path=None, topic_cache=None, fast_retrieval=False, result_format="full",
+                 context_budget=None, llm_transport=None, phase_timeouts=None, request_timeout=None,
+                 prefetch_catalog=False, search_mode="match", embedding_model="hashed"):
+        self.model_name = model_name
+        self.workers = workers
+        self.limiter = BackendLimiter(backend_limits)
+        self.library_system = library_system or LibrarySystem(
+            model_name=model_name,
+            llm_cache_path=llm_cache_path,
+            topic_cache=topic_cache,
+            fast_retrieval=fast_retrieval,
+            result_format=result_format,
+            context_budget=context_budget,
+            llm_transport=llm_transport,
+            phase_timeouts=phase_timeouts,
+            request_timeout=request_timeout,
+            prefetch_catalog=prefetch_catalog,
+            search_mode=search_mode,
+            embedding_model=embedding_model,
+            llm_limiter=self.limiter
+        )
+        if library_system is not None:
+            # A system built elsewhere already has its cache installed; limit it from the outside
+            self.limiter.install(self.library_system.llm, backend_for_model(model_name))
+
+    def _recommend(self, topic):
+        start_time = time.time()
+        results = self.library_system.recommend_books(topic)
+        record = {
+            "topic": topic,
+            "status": results.get("status", "ok"),
+            "requirements": str(results["requirements"]),
+            "recommendations": str(results["recommendations"]),
+            "elapsed_seconds": round(time.time() - start_time, 3)
+        }
+        if "error" in results:
+            record["error"] = results["error"]
+        return record
+
+    def run(self, topics_path, output_path):
+        topics = load_topics(topics_path)
+        done = load_checkpoint(output_path)
+        pending = [topic for topic in topics if topic not in done]
+        print(f"📦 {len(topics)} topics, {len(topics) - len(pending)} already done, {len(pending)} to run")
+
+        # Make sure a partial line left by a crash does not swallow the next record
+        if os.path.exists(output_path) and os.path.getsize(output_path) > 0:
+            with open(output_path, "rb") as file:
+                file.seek(-1, os.SEEK_END)
+                needs_newline = file.read(1) != b"\n"
+        else:
+            needs_newline = False
+
+        completed = 0
+        with open(output_path, "a", encoding="utf-8") as output, \
+                ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="batch") as pool:
+            if needs_newline:
+                output.write("\n")
+            futures = {pool.submit(self._recommend, topic): topic for topic in pending}
+            for future in as_completed(futures):
+                topic = futures[future]
+                try:
+                    record = future.result()
+                except Exception as e:
+                    record = {"topic": topic, "status": "error", "error": str(e), "elapsed_seconds": 0.0}
+                # Failed topics are recorded too, and re-queued by load_checkpoint on the next run
+                output.write(json.dumps(record, ensure_ascii=False) + "\n")
+                output.flush()
+                if record["status"] == "error":
+                    print(f"❌ Error processing topic {topic}: {record['error']}")
+                    continue
+                completed += 1
+                print(f"✅ [{completed}/{len(pending)}] {topic} ({record['elapsed_seconds']:.1f}s)")
+
+        return completed
+
+
+def parse_phase_timeouts(values):
+    timeouts = {}
+    for value in values or []:
+        phase, _, seconds = value.rpartition("=")
+        timeouts[phase.strip() or "default"] = float(seconds)
+    return timeouts
+
+
+def parse_limits(values):
+    limits = {}
+    for value in values or []:
+        backend, _, limit = value.partition("=")
+        limits[backend.strip()] = int(limit)
+    return limits
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate book recommendations for a file of topics.")
+    parser.add_argument("topics", help="Topic file (.jsonl with a 'topic' field, .csv with a 'topic' column, or one topic per line)")
+    parser.add_argument("--output", default="recommendations.jsonl", help="JSONL file results are appended to; existing topics are skipped")
+    parser.add_argument("--model", default="ollama/llama3", help="LLM model name")
+    parser.add_argument("--workers", type=int, default=4, help="Number of topics processed concurrently")
+    parser.add_argument("--limit", action="append", metavar="BACKEND=N",
+                        help="Maximum concurrent LLM calls for a backend, e.g. ollama=2")
+    parser.add_argument("--llm-cache", default=None, metavar="PATH",
+                        help="SQLite file used to cache LLM responses across runs")
+    parser.add_argument("--topic-cache", default=None, metavar="PATH",
+                        help="JSON file used to reuse results for near-duplicate topics")
+    parser.add_argument("--topic-threshold", type=float, default=0.8,
+                        help="Trigram similarity above which two topics count as the same")
+    parser.add_argument("--topic-ttl", type=float, default=None, metavar="SECONDS",
+                        help="Age after which a topic cache entry is recomputed (default: never)")
+    parser.add_argument("--fast-retrieval", action="store_true",
+                        help="Search the catalog with the demand analysis keywords instead of the Retrieval Specialist agent")
+    parser.add_argument("--prefetch-catalog", action="store_true",
+                        help="Rank the catalog for the raw topic while the reader crew runs and hand the hits to the search step")
+    parser.add_argument("--search-mode", choices=["match", "ranked", "semantic", "hybrid"], default="match",
+                        help="How the library search tools find books (semantic/hybrid use catalog embeddings)")
+    parser.add_argument("--embedding-model", default="hashed",
+                        help='Embeddings for semantic search: "hashed" n-gram vectors or a sentence-transformers model')
+    parser.add_argument("--compact-results", action="store_true",
+                        help="Send catalog search results to the agents as compact TSV tables")
+    parser.add_argument("--context-budget", type=int, default=None, metavar="TOKENS",
+                        help="Trim the previous outputs passed into each employee task to about this many tokens")
+    parser.add_argument("--http-transport", action="store_true",
+                        help="Call the model through a shared async HTTP connection pool with retries and request coalescing")
+    parser.add_argument("--max-in-flight", type=int, default=8,
+                        help="Maximum concurrent HTTP requests when --http-transport is used")
+    parser.add_argument("--base-url", default=None,
+                        help="OpenAI-compatible API base URL for --http-transport (e.g. a local stub server)")
+    parser.add_argument("--phase-timeout", action="append", metavar="[PHASE=]SECONDS",
+                        help="Deadline for crew phases, e.g. 120 for every phase or search=60 for one")
+    parser.add_argument("--request-timeout", type=float, default=None, metavar="SECONDS",
+                        help="Latency budget per topic; phases past it fall back without calling the model")
+    parser.add_argument("--profile-dir", default=None, metavar="DIR",
+                        help="Write JSON, OpenMetrics and Chrome-trace profiles of the whole batch to DIR")
+    args = parser.parse_args()
+
+    start_time = time.time()
+    transport = None
+    if args.http_transport:
+        transport = AsyncLLMTransport.for_model(args.model, base_url=args.base_url, max_in_flight=args.max_in_flight)
+    recommender = BatchRecommender(
+        model_name=args.model,
+        workers=args.workers,
+        backend_limits=parse_limits(args.limit),
+        llm_cache_path=args.llm_cache,
+        topic_cache=TopicCache(
+            threshold=args.topic_threshold, path=args.topic_cache, ttl_seconds=args.topic_ttl
+        ) if args.topic_cache else None,
+        fast_retrieval=args.fast_retrieval,
+        result_format="compact" if args.compact_results else "full",
+        context_budget=args.context_budget,
+        llm_transport=transport,
+        phase_timeouts=parse_phase_timeouts(args.phase_timeout),
+        request_timeout=args.request_timeout,
+        prefetch_catalog=args.prefetch_catalog,
+        search_mode=args.search_mode,
+        embedding_model=args.embedding_model
+    )
+    completed = recommender.run(args.topics, args.output)
+    print(f"\nBatch completed: {completed} topics in {time.time() - start_time:.2f} seconds.")
+    if recommender.library_system.llm_cache:
+        print(f"LLM cache: {recommender.library_system.llm_cache.stats()}")
+    if recommender.library_system.topic_cache:
+        print(f"Topic cache: {recommender.library_system.topic_cache.stats()}")
+    print(f"Tool results: {recommender.library_system.library_tools.result_stats()}")
+    if transport is not None:
+        print(f"HTTP transport: {transport.stats}")
+        transport.close()
+    if recommender.library_system.context_budgeter:
+        print(f"Context budget: {recommender.library_system.context_budgeter.stats()}")
+    profiler = recommender.library_system.profiler
+    profiler.print_summary()
+    if args.profile_dir:
+        paths = profiler.export(args.profile_dir, prefix="batch")
+        print(f"Profile written to {', '.join(paths.values())}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,413 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; peak RSS is then left out of the reports
+    resource = None
+
+from src.evolution import RecommendationEvaluator
+from src.main import LibrarySystem
+from src.utils.fake_llm import FakeLLM
+from src.utils.instrumentation import PipelineProfiler
+from src.utils.library_tools import LibraryTools
+
+REPORT_FORMAT = "library-benchmark/1"
+DEFAULT_ROWS = (1_000, 100_000, 1_000_000)
+SYLLABLES = ["ka", "lo", "mi", "ra", "te", "su", "no", "vi", "de", "ba", "ze", "po", "qua", "lin", "tor", "shi",
+             "mar", "en", "ul", "fo", "gre", "han", "ix", "jo"]
+CATALOG_COLUMNS = ["Number", "Title", "Call Number", "Author", "Publication Information", "Content and Summary", "status"]
+# Metrics where a larger value in the current report is a regression; throughput is the other way round
+HIGHER_IS_WORSE = ("_seconds", "_mb", "llm_calls")
+
+
+def make_vocabulary(size, seed=0):
+    """Return `size` distinct pronounceable pseudo-words, the same ones for the same seed."""
+    rng = np.random.default_rng(seed)
+    words = {}
+    while len(words) < size:
+        syllables = rng.choice(SYLLABLES, size=rng.integers(2, 5))
+        words.setdefault("".join(syllables), None)
+    return list(words)
+
+
+def _word_probabilities(size):
+    # Zipf-like frequencies, so a few words are common and most are rare, as in real titles
+    weights = 1.0 / np.arange(1, size + 1)
+    return weights / weights.sum()
+
+
+def _phrases(rng, words, probabilities, rows, length):
+    picks = np.asarray(words, dtype=object)[rng.choice(len(words), size=(rows, length), p=probabilities)]
+    return [" ".join(row) for row in picks]
+
+
+def generate_catalog(path, rows, seed=0, vocabulary_size=20_000, summary_words=30, chunk_rows=100_000):
+    """Write a synthetic catalog CSV with `rows` books; an existing file of that name is reused."""
+    if os.path.exists(path):
+        return path
+    rng = np.random.default_rng(seed)
+    words = make_vocabulary(vocabulary_size, seed)
+    probabilities = _word_probabilities(len(words))
+    surnames = [word.capitalize() for word in words[:2_000]]
+    temp_path = f"{path}.tmp"
+    for start in range(0, rows, chunk_rows):
+        count = min(chunk_rows, rows - start)
+        numbers = np.arange(start + 1, start + count + 1)
+        authors = rng.integers(0, len(surnames), size=(count, 2))
+        frame = pd.DataFrame({
+            "Number": numbers,
+            "Title": [title.title() for title in _phrases(rng, words, probabilities, count, 3)],
+            "Call Number": [f"QA{number % 1000}.{number % 97} {number}" for number in numbers],
+            "Author": [f"{surnames[a]}, {surnames[b]}" for a, b in authors],
+            "Publication Information": [f"Synthetic Press, {year}." for year in rng.integers(1900, 2025, size=count)],
+            "Content and Summary": _phrases(rng, words, probabilities, count, summary_words),
+            "status": np.where(rng.random(count) < 0.8, "Available", "Checked out")
+        }, columns=CATALOG_COLUMNS)
+        frame.to_csv(temp_path, mode="w" if start == 0 else "a", header=start == 0, index=False)
+    os.replace(temp_path, path)
+    return path
+
+
+def generate_topics(count, seed=0, vocabulary_size=20_000, common_words=500):
+    """Return `count` distinct two or three word topics drawn from the catalog's commoner words."""
+    rng = np.random.default_rng(seed + 1)
+    words = make_vocabulary(vocabulary_size, seed)[:common_words]
+    topics = {}
+    while len(topics) < count:
+        topics.setdefault(" ".join(rng.choice(words, size=rng.integers(2, 4), replace=False)), None)
+    return list(topics)
+
+
+def generate_judgments(topics, titles, seed=0, relevant=10, predicted=10, overlap=0.5):
+    """Return synthetic (ground truth, predictions) for the evaluator.
+
+    Each topic is judged to have `relevant` books with graded scores; its
+    prediction text lists `predicted` titles, about `overlap` of them relevant."""
+    rng = np.random.default_rng(seed + 2)
+    ground_truth, predictions = {}, {}
+    for topic in topics:
+        picks = rng.choice(len(titles), size=relevant + predicted, replace=False)
+        judged = [titles[i] for i in picks[:relevant]]
+        hits = judged[:int(predicted * overlap)]
+        listed = hits + [titles[i] for i in picks[relevant:relevant + predicted - len(hits)]]
+        ground_truth[topic] = (judged, [float(score) for score in rng.integers(1, 4, size=relevant)])
+        predictions[topic] = {
+            "recommendations": "\n".join(f'{position}. "{title}"' for position, title in enumerate(listed, 1))
+        }
+    return ground_truth, predictions
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    scale = 1024 * 1024 if platform.system() == "Darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def latency_stats(latencies, wall_seconds):
+    latencies = np.asarray(latencies, dtype=float)
+    if not len(latencies):
+        return {"count": 0}
+    return {
+        "count": len(latencies),
+        "wall_seconds": round(wall_seconds, 6),
+        "throughput_per_second": round(len(latencies) / wall_seconds, 3) if wall_seconds > 0 else None,
+        "mean_seconds": round(float(latencies.mean()), 6),
+        "p50_seconds": round(float(np.percentile(latencies, 50)), 6),
+        "p95_seconds": round(float(np.percentile(latencies, 95)), 6),
+        "p99_seconds": round(float(np.percentile(latencies, 99)), 6),
+        "max_seconds": round(float(latencies.max()), 6)
+    }
+
+
+def measure(function, items, workers=1, trace_memory=False):
+    """Call function on every item (on `workers` threads) and return latency and memory statistics."""
+    latencies = [0.0] * len(items)
+
+    def timed(position):
+        start = time.perf_counter()
+        function(items[position])
+        latencies[position] = time.perf_counter() - start
+
+    if trace_memory:
+        tracemalloc.start()
+    rss_before = peak_rss_mb()
+    start = time.perf_counter()
+    if workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(timed, range(len(items))))
+    else:
+        for position in range(len(items)):
+            timed(position)
+    stats = latency_stats(latencies, time.perf_counter() - start)
+    if rss_before is not None:
+        stats["peak_rss_mb"] = round(peak_rss_mb(), 1)
+        stats["peak_rss_growth_mb"] = round(peak_rss_mb() - rss_before, 1)
+    if trace_memory:
+        stats["traced_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 1)
+        tracemalloc.stop()
+    return stats
+
+
+def tool_counts(profiler):
+    """Calls per library tool recorded by a profiler."""
+    return {row["name"]: row["count"] for row in profiler.summary() if row["category"] == "tool"}
+
+
+def call_tool(library_tools, name, *args):
+    """Run a LibraryTools tool body directly, without an agent in between."""
+    tool = getattr(type(library_tools), name)
+    # crewAI / LangChain tool objects keep the decorated function in .func
+    return getattr(tool, "func", tool)(library_tools, *args)
+
+
+def benchmark_search(library_path, topics, workers=1, trace_memory=False):
+    """Catalog load and library tool latencies for one catalog."""
+    library_tools = LibraryTools(library_path, search_mode="match")
+    library_tools.profiler = PipelineProfiler()
+    results = {"catalog_load": measure(lambda _: library_tools.storage.rank("warmup"), [None], trace_memory=trace_memory)}
+
+    results["search_library"] = measure(
+        lambda topic: call_tool(library_tools, "search_library", topic), topics, workers, trace_memory
+    )
+    library_tools.search_mode = "ranked"
+    results["search_library_ranked"] = measure(
+        lambda topic: call_tool(library_tools, "search_library", topic), topics, workers, trace_memory
+    )
+    results["search_library_batch"] = measure(
+        lambda topic: call_tool(library_tools, "search_library_batch", topic.split()), topics, workers, trace_memory
+    )
+    results["search_keywords"] = measure(
+        lambda topic: library_tools.search_keywords(topic.split()), topics, workers, trace_memory
+    )
+    results["tool_calls"] = tool_counts(library_tools.profiler)
+    results["result_tokens"] = library_tools.result_stats()
+    return results
+
+
+def pipeline_llm(topics, latency_seconds=0.0, jitter_seconds=0.0, seed=0):
+    """A FakeLLM that keeps each request's topic flowing through every phase of the pipeline.
+
+    Every answer names the topic the prompt mentions, so the Demand Assistant's
+    keywords, and therefore the catalog searches, are those of the topic."""
+    # Longest first, so a topic is never mistaken for a shorter one it contains
+    known = sorted(topics, key=len, reverse=True)
+
+    def answer(prompt):
+        lowered = prompt.lower()
+        topic = next((topic for topic in known if topic.lower() in lowered), "library")
+        keywords = "\n".join(f"- {word}" for word in [topic] + topic.split())
+        return f"Title keywords:\n{keywords}\n\n1. \"{topic.title()}\" matches the requested topic {topic}."
+
+    return FakeLLM(
+        default_response=answer,
+        tool_calls=[(
+            "search in library database for several queries",
+            "Search in library database for several queries",
+            lambda prompt: {"queries": [next((t for t in known if t.lower() in prompt.lower()), "library")]}
+        )],
+        latency_seconds=latency_seconds,
+        jitter_seconds=jitter_seconds,
+        seed=seed
+    )
+
+
+def benchmark_pipeline(library_path, topics, workers=1, fast_retrieval=False, latency_seconds=0.0,
+                       jitter_seconds=0.0, seed=0, trace_memory=False, verbose=False):
+    """End-to-end recommend_books latency with the model replaced by a FakeLLM."""
+    fake_llm = pipeline_llm(topics, latency_seconds, jitter_seconds, seed)
+    profiler = PipelineProfiler()
+    # The pipeline reports progress on stdout; keep the benchmark output readable
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    with output:
+        system = LibrarySystem(
+            model_name="fake",
+            library_path=library_path,
+            profiler=profiler,
+            fast_retrieval=fast_retrieval,
+            llm_transport=fake_llm
+        )
+        results = {"recommend_books": measure(system.recommend_books, topics, workers, trace_memory)}
+    llm_stats = fake_llm.stats()
+    results["recommend_books"]["llm_calls"] = llm_stats["calls"]
+    results["recommend_books"]["llm_sleep_seconds"] = round(llm_stats["sleep_seconds"], 6)
+    results["tool_calls"] = tool_counts(profiler)
+    results["phases"] = {
+        row["name"]: {"count": row["count"], "total_seconds": round(row["total_seconds"], 6)}
+        for row in profiler.summary() if row["category"] == "crew"
+    }
+    return results
+
+
+def benchmark_evaluation(data_dir, titles, topic_count, seed=0, trace_memory=False):
+    """Ground truth loading and metric computation for `topic_count` synthetic topics."""
+    topics = generate_topics(topic_count, seed)
+    ground_truth, predictions = generate_judgments(topics, titles, seed)
+    path = os.path.join(data_dir, f"ground_truth_{topic_count}_{seed}.jsonl")
+    with open(path, "w", encoding="utf-8") as file:
+        for topic, (books, scores) in ground_truth.items():
+            file.write(json.dumps({"topic": topic, "relevant_books": books, "relevance_scores": scores}) + "\n")
+
+    evaluator = RecommendationEvaluator()
+    results = {"load_ground_truth": measure(lambda _: evaluator.load_ground_truth(path), [None], trace_memory=trace_memory)}
+    results["evaluate_topic"] = measure(
+        lambda topic: evaluator.evaluate_topic(topic, predictions[topic]["recommendations"]),
+        topics, trace_memory=trace_memory
+    )
+    results["run_evaluation"] = measure(lambda _: evaluator.run_evaluation(predictions), [None], trace_memory=trace_memory)
+    results["run_evaluation"]["topics"] = topic_count
+    return results
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__
+    }
+
+
+def flatten_metrics(results, prefix=""):
+    """Flatten nested report results into {"rows=1000/search_library/p95_seconds": value}."""
+    metrics = {}
+    for key, value in results.items():
+        name = f"{prefix}/{key}" if prefix else key
+        if isinstance(value, dict):
+            metrics.update(flatten_metrics(value, name))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            metrics[name] = value
+    return metrics
+
+
+def compare_reports(baseline, current, tolerance=0.1):
+    """Return one row per metric in both reports, flagging changes for the worse beyond `tolerance`."""
+    before, after = flatten_metrics(baseline["results"]), flatten_metrics(current["results"])
+    rows = []
+    for name in before.keys() & after.keys():
+        old, new = before[name], after[name]
+        change = (new - old) / old if old else (0.0 if new == old else float("inf"))
+        worse = change if name.endswith(HIGHER_IS_WORSE) or "/tool_calls/" in name else -change if name.endswith("_per_second") else 0.0
+        rows.append({"metric": name, "baseline": old, "current": new, "change": change, "regression": worse > tolerance})
+    return sorted(rows, key=lambda row: row["metric"])
+
+
+def print_comparison(rows):
+    print(f"{'metric':70} {'baseline':>12} {'current':>12} {'change':>9}")
+    for row in rows:
+        flag = "  ⚠️ regression" if row["regression"] else ""
+        print(f"{row['metric']:70} {row['baseline']:>12.4g} {row['current']:>12.4g} {row['change']:>+8.1%}{flag}")
+
+
+def run_benchmarks(rows=DEFAULT_ROWS, topic_count=50, pipeline_topics=10, evaluation_topics=1_000,
+                   benchmarks=("search", "pipeline", "evaluation"), data_dir="data/benchmark", workers=1,
+                   fast_retrieval=False, llm_latency=0.0, llm_jitter=0.0, seed=0, trace_memory=False, verbose=False):
+    """Run the selected benchmarks for every catalog size and return the report."""
+    os.makedirs(data_dir, exist_ok=True)
+    topics = generate_topics(topic_count, seed)
+    report = {
+        "format": REPORT_FORMAT,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "environment": environment(),
+        "config": {
+            "rows": list(rows), "topics": topic_count, "pipeline_topics": pipeline_topics,
+            "evaluation_topics": evaluation_topics, "benchmarks": list(benchmarks), "workers": workers,
+            "fast_retrieval": fast_retrieval, "llm_latency": llm_latency, "llm_jitter": llm_jitter, "seed": seed
+        },
+        "catalogs": {},
+        "results": {}
+    }
+    for row_count in rows:
+        path = os.path.join(data_dir, f"catalog_{row_count}_{seed}.csv")
+        print(f"📚 Catalog with {row_count} rows: {path}")
+        start = time.perf_counter()
+        generate_catalog(path, row_count, seed)
+        # Kept out of the results: a reused catalog takes no time to "generate"
+        report["catalogs"][path] = {"rows": row_count, "generate_seconds": round(time.perf_counter() - start, 3)}
+        scale = report["results"].setdefault(f"rows={row_count}", {})
+        if "search" in benchmarks:
+            print("🔍 Benchmarking library search...")
+            scale["search"] = benchmark_search(path, topics, workers, trace_memory)
+        if "pipeline" in benchmarks:
+            print("🤖 Benchmarking the recommendation pipeline with a fake LLM...")
+            scale["pipeline"] = benchmark_pipeline(
+                path, topics[:pipeline_topics], workers, fast_retrieval, llm_latency, llm_jitter, seed,
+                trace_memory, verbose
+            )
+    if "evaluation" in benchmarks:
+        print("📊 Benchmarking evaluation...")
+        titles = pd.read_csv(os.path.join(data_dir, f"catalog_{rows[0]}_{seed}.csv"), usecols=["Title"])["Title"].tolist()
+        report["results"]["evaluation"] = benchmark_evaluation(data_dir, titles, evaluation_topics, seed, trace_memory)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark search, the recommendation pipeline and evaluation offline.")
+    parser.add_argument("--rows", type=int, nargs="+", default=list(DEFAULT_ROWS),
+                        help="Synthetic catalog sizes to benchmark")
+    parser.add_argument("--topics", type=int, default=50, help="Synthetic topics used for search")
+    parser.add_argument("--pipeline-topics", type=int, default=10,
+                        help="Topics sent through recommend_books at each catalog size")
+    parser.add_argument("--evaluation-topics", type=int, default=1_000, help="Synthetic topics judged by the evaluator")
+    parser.add_argument("--only", nargs="+", choices=["search", "pipeline", "evaluation"],
+                        default=["search", "pipeline", "evaluation"], help="Benchmarks to run")
+    parser.add_argument("--data-dir", default="data/benchmark", help="Where synthetic catalogs are generated and reused")
+    parser.add_argument("--workers", type=int, default=1, help="Concurrent requests / searches")
+    parser.add_argument("--fast-retrieval", action="store_true", help="Benchmark the pipeline's fast retrieval path")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Seconds the fake LLM waits per call")
+    parser.add_argument("--llm-jitter", type=float, default=0.0, help="Extra deterministic 0..N seconds per call")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="Also report Python allocation peaks (tracemalloc; slows everything down)")
+    parser.add_argument("--verbose", action="store_true", help="Show the pipeline's own output")
+    parser.add_argument("--output", default=None, metavar="PATH", help="Write the JSON report here")
+    parser.add_argument("--compare", default=None, metavar="BASELINE", help="Compare against an earlier JSON report")
+    parser.add_argument("--tolerance", type=float, default=0.1,
+                        help="Relative change for the worse that counts as a regression")
+    args = parser.parse_args()
+
+    report = run_benchmarks(
+        rows=args.rows, topic_count=args.topics, pipeline_topics=args.pipeline_topics,
+        evaluation_topics=args.evaluation_topics, benchmarks=args.only, data_dir=args.data_dir,
+        workers=args.workers, fast_retrieval=args.fast_retrieval, llm_latency=args.llm_latency,
+        llm_jitter=args.llm_jitter, seed=args.seed, trace_memory=args.trace_memory, verbose=args.verbose
+    )
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            file.write(text)
+        print(f"Report written to {args.output}")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+        if baseline.get("config") != report["config"]:
+            print("⚠️ The baseline was run with different settings; differences may not be regressions")
+        rows = compare_reports(baseline, report, args.tolerance)
+        print_comparison(rows)
+        regressions = sum(row["regression"] for row in rows)
+        print(f"\n{regressions} regression(s) beyond {args.tolerance:.0%}")
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,43 +1,101 @@
 import pandas as pd
 import numpy as np
+import ast
 import json
-import re
-from typing import List, Dict, Tuple, Any
+from typing import List, Dict, Tuple, Any, Iterator, Sequence
+
+from src.utils.title_extractor import extract_titles, extract_titles_batch
+from src.utils.title_index import TitleIndex
+
+DEFAULT_CUTOFFS = (1, 5, 10, 20)
+METRICS = ['precision', 'recall', 'f1', 'ndcg']
+
+_discounts = 1.0 / np.log2(np.arange(2, 66))
+
+
+def discount_table(length: int) -> np.ndarray:
+    """Return the DCG position discounts 1 / log2(i + 2) for the first `length` positions."""
+    global _discounts
+    if length > len(_discounts):
+        _discounts = 1.0 / np.log2(np.arange(2, 2 * length + 2))
+    return _discounts[:length]
+
+
+def parse_list_column(values: pd.Series) -> List[list]:
+    """Parse a column of list cells stored as JSON arrays or Python list literals."""
+    values = values.tolist()
+    if all(isinstance(value, (list, tuple, np.ndarray)) for value in values):
+        return [list(value) for value in values]
+
+    # The first non-empty cell decides the format of the column: legacy Python
+    # list literals then skip the JSON attempts that would fail on every row
+    sample = next((value for value in values if isinstance(value, str) and value.strip()), None)
+    try:
+        json.loads(sample)
+        use_json = True
+    except (TypeError, ValueError):
+        use_json = False
+
+    if use_json:
+        # Fast path: decode the whole chunk with a single JSON parse
+        try:
+            parsed = json.loads("[" + ",".join(values) + "]")
+            if len(parsed) == len(values):
+                return parsed
+        except (TypeError, ValueError):
+            pass
+
+    parsed = []
+    for value in values:
+        if isinstance(value, (list, tuple, np.ndarray)):
+            parsed.append(list(value))
+        elif not use_json:
+            parsed.append(ast.literal_eval(value))
+        else:
+            # A column mixing both formats still parses, one cell at a time
+            try:
+                parsed.append(json.loads(value))
+            except (TypeError, ValueError):
+                parsed.append(ast.literal_eval(value))
+    return parsed
 
 
 class RecommendationEvaluator:
+    GROUND_TRUTH_COLUMNS = ['topic', 'relevant_books', 'relevance_scores']
+
     def __init__(self):
         self.ground_truth = {}
 
-    def load_ground_truth(self, file_path: str):
-        df = pd.read_csv(file_path)
-        for _, row in df.iterrows():
-            topic = row['topic']
-            relevant_books = eval(row['relevant_books'])
-            scores = eval(row['relevance_scores'])
-            self.ground_truth[topic] = list(zip(relevant_books, scores))
+    def _read_ground_truth_chunks(self, file_path: str, chunksize: int) -> Iterator[pd.DataFrame]:
+        columns = self.GROUND_TRUTH_COLUMNS
+        if file_path.endswith('.parquet'):
+            import pyarrow.parquet as pq
+            for batch in pq.ParquetFile(file_path).iter_batches(batch_size=chunksize, columns=columns):
+                yield batch.to_pandas()
+        elif file_path.endswith(('.jsonl', '.ndjson')):
+            yield from pd.read_json(file_path, lines=True, chunksize=chunksize)
+        else:
+            yield from pd.read_csv(file_path, usecols=columns, chunksize=chunksize)
+
+    def load_ground_truth(self, file_path: str, chunksize: int = 100_000):
+        """Load judgments from CSV, JSONL or Parquet.
+
+        List columns may hold JSON arrays or Python list literals; they are
+        parsed without eval and the file is streamed in chunks."""
+        for chunk in self._read_ground_truth_chunks(file_path, chunksize):
+            relevant_books = parse_list_column(chunk['relevant_books'])
+            scores = parse_list_column(chunk['relevance_scores'])
+            self.ground_truth.update(zip(
+                chunk['topic'].tolist(),
+                [list(zip(books, book_scores)) for books, book_scores in zip(relevant_books, scores)]
+            ))
 
     def extract_book_titles(self, text: str) -> List[str]:
-        patterns = [
-            r'"([^"]+)"',
-            r"'([^']+)'",
-            r'《([^》]+)》',
-            r'Title[：:]\s*([^\n\r,，]+)',
-            r'(\d+\.\s*[^\n\r]+)'
-        ]
-
-        titles = []
-        for pattern in patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            titles.extend(matches)
-
-        cleaned = []
-        for title in titles:
-            title = title.strip().replace('\n', ' ')
-            if len(title) > 3 and title not in cleaned:
-                cleaned.append(title)
-
-        return cleaned[:10]
+        return extract_titles(text, limit=10)
+
+    def extract_book_titles_batch(self, texts: List[str], processes: int = None,
+                                  limit: int = 10) -> List[List[str]]:
+        return extract_titles_batch(texts, processes=processes, limit=limit)
 
     def calculate_precision(self, predicted: List[str], relevant: List[Tuple[str, float]], k: int = 10) -> float:
         if not predicted or not relevant:
@@ -68,15 +126,11 @@ class RecommendationEvaluator:
 
         relevance_dict = {book[0]: book[1] for book in relevant}
 
-        dcg = 0.0
-        for i, book in enumerate(predicted[:k]):
-            relevance = relevance_dict.get(book, 0.0)
-            dcg += relevance / np.log2(i + 2)
+        gains = np.array([relevance_dict.get(book, 0.0) for book in predicted[:k]], dtype=float)
+        dcg = float(gains @ discount_table(len(gains)))
 
-        sorted_relevance = sorted([score for _, score in relevant], reverse=True)
-        idcg = 0.0
-        for i, relevance in enumerate(sorted_relevance[:k]):
-            idcg += relevance / np.log2(i + 2)
+        ideal = np.sort(np.array([score for _, score in relevant], dtype=float))[::-1][:k]
+        idcg = float(ideal @ discount_table(len(ideal)))
 
         return dcg / idcg if idcg > 0 else 0.0
 
@@ -96,19 +150,118 @@ class RecommendationEvaluator:
             'ndcg': ndcg
         }
 
-    def run_evaluation(self, predictions: Dict[str, Dict[str, str]]) -> Dict[str, Any]:
+    def match_to_ground_truth(self, predicted: Dict[str, List[str]],
+                              threshold: float = 0.7) -> Dict[str, List[str]]:
+        """Replace predicted titles with the ground-truth title they fuzzily match, if any.
+
+        Extracted titles often differ from the judged ones only in case,
+        punctuation, accents or a leading article; mapping them first keeps
+        those near-misses from being counted as wrong."""
+        matched = {}
+        for topic, titles in predicted.items():
+            index = TitleIndex(book for book, _ in self.ground_truth.get(topic, []))
+            if not len(index):
+                matched[topic] = list(titles)
+                continue
+            mapped = {}
+            for title in titles:
+                match = index.best_match(title, threshold=threshold)
+                mapped.setdefault(match[0] if match else title, None)
+            # Two spellings of the same book count once
+            matched[topic] = list(mapped)
+        return matched
+
+    def evaluate_batch(self, predicted: Dict[str, List[str]],
+                       cutoffs: Sequence[int] = DEFAULT_CUTOFFS) -> Dict[str, Any]:
+        """Compute precision, recall, F1 and NDCG for many topics at several cutoffs at once.
+
+        Predictions and judgments are joined in one vectorized merge and packed
+        into (topics x positions) arrays; every metric at every cutoff is then
+        a column of a cumulative sum. Results match the per-topic methods."""
+        topics = list(predicted)
+        max_k = max(cutoffs)
+        n_topics = len(topics)
+
+        pred_frame = pd.DataFrame({
+            'topic_idx': np.repeat(np.arange(n_topics), [len(predicted[t][:max_k]) for t in topics]),
+            'title': [title for t in topics for title in predicted[t][:max_k]]
+        })
+        pred_frame['position'] = pred_frame.groupby('topic_idx').cumcount()
+
+        judgments = [self.ground_truth.get(t, []) for t in topics]
+        truth_frame = pd.DataFrame({
+            'topic_idx': np.repeat(np.arange(n_topics), [len(j) for j in judgments]),
+            'title': [book for j in judgments for book, _ in j],
+            'score': np.array([score for j in judgments for _, score in j], dtype=float)
+        })
+
+        # Later judgments for the same title win, as in calculate_ndcg
+        unique_truth = truth_frame.drop_duplicates(['topic_idx', 'title'], keep='last')
+        n_relevant = np.bincount(unique_truth['topic_idx'], minlength=n_topics)
+        joined = pred_frame.merge(unique_truth, on=['topic_idx', 'title'], how='left')
+
+        rows, cols = joined['topic_idx'].to_numpy(), joined['position'].to_numpy()
+        first_seen = np.zeros((n_topics, max_k))
+        hits = np.zeros((n_topics, max_k))
+        gains = np.zeros((n_topics, max_k))
+        is_first = ~joined.duplicated(['topic_idx', 'title']).to_numpy()
+        first_seen[rows, cols] = is_first
+        hits[rows, cols] = is_first & joined['score'].notna().to_numpy()
+        gains[rows, cols] = joined['score'].fillna(0.0).to_numpy()
+
+        # Ideal ranking: each topic's judgment scores sorted in descending order
+        ideal = np.zeros((n_topics, max_k))
+        ranked_truth = truth_frame.sort_values(['topic_idx', 'score'], ascending=[True, False], kind='stable')
+        ranks = ranked_truth.groupby('topic_idx').cumcount().to_numpy()
+        keep = ranks < max_k
+        ideal[ranked_truth['topic_idx'].to_numpy()[keep], ranks[keep]] = ranked_truth['score'].to_numpy()[keep]
+
+        discounts = discount_table(max_k)
+        cumulative_seen = np.cumsum(first_seen, axis=1)
+        cumulative_hits = np.cumsum(hits, axis=1)
+        cumulative_dcg = np.cumsum(gains * discounts, axis=1)
+        cumulative_idcg = np.cumsum(ideal * discounts, axis=1)
+
+        results = {'topics': topics}
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for k in cutoffs:
+                seen, hit = cumulative_seen[:, k - 1], cumulative_hits[:, k - 1]
+                dcg, idcg = cumulative_dcg[:, k - 1], cumulative_idcg[:, k - 1]
+                precision = np.where(seen > 0, hit / seen, 0.0)
+                recall = np.where(n_relevant > 0, hit / n_relevant, 0.0)
+                results[f'precision@{k}'] = precision
+                results[f'recall@{k}'] = recall
+                results[f'f1@{k}'] = np.where(precision + recall > 0,
+                                               2 * precision * recall / (precision + recall), 0.0)
+                results[f'ndcg@{k}'] = np.where(idcg > 0, dcg / idcg, 0.0)
+        return results
+
+    def run_evaluation(self, predictions: Dict[str, Dict[str, str]],
+                       cutoffs: Sequence[int] = None, processes: int = None,
+                       fuzzy_threshold: float = None) -> Dict[str, Any]:
+        topics = [topic for topic in predictions if topic in self.ground_truth]
+        texts = [predictions[topic].get('recommendations', '') for topic in topics]
+        extra_cutoffs = [k for k in (cutoffs or []) if k != 10]
+        # Extraction keeps match order, so the first 10 titles are the same at any limit
+        limit = max([10] + extra_cutoffs)
+        predicted = dict(zip(topics, self.extract_book_titles_batch(texts, processes=processes, limit=limit)))
+        if fuzzy_threshold is not None:
+            predicted = self.match_to_ground_truth(predicted, threshold=fuzzy_threshold)
+        batch = self.evaluate_batch(predicted, cutoffs=[10] + extra_cutoffs)
+
         results = []
-        for topic, pred_data in predictions.items():
-            if topic in self.ground_truth:
-                recommendation_text = pred_data.get('recommendations', '')
-                topic_result = self.evaluate_topic(topic, recommendation_text)
-                topic_result['topic'] = topic
-                results.append(topic_result)
+        for i, topic in enumerate(batch['topics']):
+            topic_result = {metric: float(batch[f'{metric}@10'][i]) for metric in METRICS}
+            topic_result['topic'] = topic
+            results.append(topic_result)
 
         avg_metrics = {}
         if results:
-            for metric in ['precision', 'recall', 'f1', 'ndcg']:
-                avg_metrics[f'avg_{metric}'] = np.mean([r[metric] for r in results])
+            for metric in METRICS:
+                avg_metrics[f'avg_{metric}'] = float(np.mean(batch[f'{metric}@10']))
+            for k in extra_cutoffs:
+                for metric in METRICS:
+                    avg_metrics[f'avg_{metric}@{k}'] = float(np.mean(batch[f'{metric}@{k}']))
 
         return {
             'individual_results': results,
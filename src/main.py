@@ -1,18 +1,62 @@
 from dotenv import load_dotenv
 import os
 import time
-from crewai import Crew, Agent, Task, Process, LLM
+import asyncio
+import queue
+import threading
+import contextvars
+from contextlib import contextmanager
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait
+from crewai import Agent, Task, Process, LLM
+
+try:
+    from crewai.events import crewai_event_bus, LLMStreamChunkEvent
+except ImportError:
+    try:
+        # crewAI before 1.0 kept the event bus under utilities
+        from crewai.utilities.events import crewai_event_bus
+        from crewai.utilities.events.llm_events import LLMStreamChunkEvent
+    except ImportError:
+        # crewAI versions without an event bus do not stream tokens
+        crewai_event_bus = None
 
 from src.agents.reader_agents import ReaderAgents
 from src.agents.employee_agents import EmployeeAgents
 from src.tasks.reader_tasks import ReaderTasks
 from src.tasks.employee_tasks import EmployeeTasks
 from src.utils.library_tools import LibraryTools
+from src.utils.llm_cache import LLMResponseCache
+from src.utils.instrumentation import PipelineProfiler
+from src.utils.agent_pool import AgentPool
+from src.utils.keyword_parser import parse_keywords
+from src.utils.context_budget import ContextBudgeter
+from src.utils.deadlines import PhaseTimeout, phase_budget, request_deadline, run_with_timeout
 
 load_dotenv()
 
+# Callback receiving streamed LLM chunks for the running request. The event bus
+# is global and calls handlers in the emitting thread, whose context (copied
+# from the request's) routes chunks to the request that is running the crew.
+_token_sink = contextvars.ContextVar("token_sink", default=None)
+
+# (status, message) pairs for the phases of the running request that failed or fell
+# back. The list is shared by reference with the request's worker threads, which
+# run in copies of its context.
+_request_issues = contextvars.ContextVar("request_issues", default=None)
+
+if crewai_event_bus is not None:
+    @crewai_event_bus.on(LLMStreamChunkEvent)
+    def _dispatch_stream_chunk(source, event):
+        sink = _token_sink.get()
+        if sink is not None:
+            sink(event.chunk)
+
 class LibrarySystem:
-    def __init__(self, model_name="ollama/llama3"):
+    def __init__(self, model_name="ollama/llama3", parallel_readers=False, llm_cache_path=None,
+                 topic_cache=None, library_path="data/lite_library.csv", profiler=None,
+                 fast_retrieval=False, result_format="full", context_budget=None,
+                 llm_transport=None, phase_timeouts=None, request_timeout=None, prefetch_catalog=False,
+                 prefetch_top_k=20, search_mode="match", embedding_model="hashed", llm_limiter=None):
         # Use Ollama for LLM if model name starts with "ollama/"
         if model_name.startswith("ollama/"):
             self.llm = LLM(model=model_name, base_url="http://localhost:11434")
@@ -20,8 +64,35 @@ class LibrarySystem:
             # Otherwise use OpenAI or other models
             self.llm = LLM(model=model_name)
         
+        # Optional AsyncLLMTransport: pooled keep-alive connections, an in-flight limit,
+        # retries and coalescing of identical concurrent prompts
+        self.llm_transport = llm_transport
+        if llm_transport is not None:
+            llm_transport.install(self.llm)
+        
+        # Optional concurrency limiter (e.g. the batch BackendLimiter); installed below the
+        # response cache so cache hits never wait for a slot on the backend
+        if llm_limiter is not None:
+            llm_limiter.install(self.llm)
+        
+        # Per-phase wall time, LLM calls and tokens; installed before the response
+        # cache so only calls that actually reach the model are counted
+        self.profiler = profiler or PipelineProfiler()
+        self.profiler.instrument_llm(self.llm)
+        
+        # Optionally replay identical prompts from a persistent response cache
+        self.llm_cache = None
+        if llm_cache_path:
+            self.llm_cache = LLMResponseCache(llm_cache_path)
+            self.llm_cache.wrap(self.llm)
+        
         # Initialize tools
-        self.library_tools = LibraryTools()
+        self.library_path = library_path
+        # result_format="compact" sends tool results as truncated TSV tables to cut prompt size
+        self.library_tools = LibraryTools(
+            library_path, search_mode=search_mode, result_format=result_format, embedding_model=embedding_model
+        )
+        self.library_tools.profiler = self.profiler
         
         # Initialize agents
         self.reader_agents = ReaderAgents(self.llm)
@@ -29,7 +100,52 @@ class LibrarySystem:
         
         # Initialize tasks
         self.reader_tasks = ReaderTasks()
-        self.employee_tasks = EmployeeTasks()
+        # With context_budget set, previous outputs chained into each employee task are
+        # trimmed to that many (estimated) tokens so prompts stay flat through the pipeline
+        self.context_budgeter = ContextBudgeter(context_budget) if context_budget else None
+        self.employee_tasks = EmployeeTasks(self.context_budgeter)
+        
+        # Agents and their crews are built once and leased to one request at a time
+        self.reader_pool = AgentPool({
+            "knowledge_expander": self.reader_agents.create_knowledge_expander,
+            "inherent_knowledge_keeper": self.reader_agents.create_inherent_knowledge_keeper,
+            "multidimensional_integrator": self.reader_agents.create_multidimensional_integrator
+        })
+        self.employee_pool = AgentPool({
+            "demand_assistant": self.employee_agents.create_demand_assistant,
+            "retrieval_assistant": self.employee_agents.create_retrieval_assistant,
+            "organization_assistant": self.employee_agents.create_organization_assistant,
+            "collection_assistant": self.employee_agents.create_collection_assistant,
+            "recommendation_assistant": self.employee_agents.create_recommendation_assistant
+        })
+        
+        # Run the three reader perspectives concurrently instead of one after another
+        self.parallel_readers = parallel_readers
+        
+        # Optional TopicCache answering repeated or near-duplicate topics without running the crews
+        self.topic_cache = topic_cache
+        
+        # Search the catalog directly with the Demand Assistant's keywords instead of
+        # letting the Retrieval Specialist pick queries over several LLM round-trips
+        self.fast_retrieval = fast_retrieval
+        
+        # Deadlines in seconds per crew phase ({"search": 60, "default": 120}) and for a
+        # whole request; a phase that runs over is replaced by a cheap fallback
+        self.phase_timeouts = phase_timeouts or {}
+        self.request_timeout = request_timeout
+        
+        # Rank the catalog for the raw topic in the background while the reader crew
+        # runs, so the search step starts from a warm candidate set
+        self.prefetch_catalog = prefetch_catalog
+        self.prefetch_top_k = prefetch_top_k
+        self._prefetch_executor = (
+            ThreadPoolExecutor(max_workers=2, thread_name_prefix="prefetch") if prefetch_catalog else None
+        )
+        
+        # Streaming requests in flight; llm.stream is on only while there is one
+        self._streaming_requests = 0
+        self._stream_lock = threading.Lock()
+        self._stream_previous = None
     
     def safe_get_output(self, crew_output, task_id=None, index=0):
         """Safely extract output from crew results, handling different crewAI versions"""
@@ -72,62 +188,252 @@ class LibrarySystem:
             print(f"Error extracting task output: {e}")
             return f"Error processing task output: {str(e)}"
     
-    def run_reader_crew(self, topic):
+    def _kickoff(self, crew, phase, **attributes):
+        """Run a crew inside a profiler span named after its phase, raising PhaseTimeout past its deadline"""
+        with self.profiler.span(phase, "crew", **attributes) as span:
+            # Pooled agents count tokens across kickoffs; only this kickoff's growth is charged
+            usage_before = self.profiler.crew_usage(crew)
+            try:
+                timeout = phase_budget(phase, self.phase_timeouts.get(phase, self.phase_timeouts.get("default")))
+                if timeout is None:
+                    output = crew.kickoff()
+                else:
+                    output = run_with_timeout(crew.kickoff, timeout, phase)
+            except PhaseTimeout:
+                span.attributes["timed_out"] = True
+                raise
+            self.profiler.record_crew_usage(span, output, crew, usage_before)
+            return output
+    
+    def _fallback(self, error, on_event, value, agent_set=None):
+        """Report a phase that ran over and return the value used in its place"""
+        print(f"⏱️ {error}; continuing with a fallback")
+        self._emit(on_event, "fallback", str(error), phase=error.phase)
+        self._report_issue("degraded", str(error))
+        if agent_set is not None and error.still_running:
+            # The overrunning crew is still using these agents in the background
+            agent_set.abandoned = True
+        return value
+    
+    def _fallback_requirements(self, topic):
+        return f"""
+            1. Requirement for exploring emerging trends in {topic}.
+            2. Requirement for understanding core principles of {topic}.
+            3. Requirement for connecting {topic} with other disciplines.
+            """
+    
+    def _start_prefetch(self, topic):
+        """Start ranking the catalog for the raw topic in the background; None when prefetching is off"""
+        if self._prefetch_executor is None:
+            return None
+        
+        def rank_topic():
+            with self.profiler.span("prefetch", "tool", topic=topic):
+                return self.library_tools.rank_many([topic], top_k=self.prefetch_top_k)[0]
+        
+        print("🔮 Prefetching catalog candidates for the topic...")
+        return self._prefetch_executor.submit(contextvars.copy_context().run, rank_topic)
+    
+    def _prefetched_hits(self, prefetch, topic):
+        """Return {topic: (rows, scores)} from a finished prefetch, or an empty dict"""
+        if prefetch is None:
+            return {}
+        # Waiting for the prefetch counts against the search phase's deadline
         try:
-            print("🧠 Creating reader agents...")
-            # Create agents
-            knowledge_expander = self.reader_agents.create_knowledge_expander()
-            inherent_knowledge_keeper = self.reader_agents.create_inherent_knowledge_keeper()
-            multidimensional_integrator = self.reader_agents.create_multidimensional_integrator()
-            
-            print("📝 Creating reader tasks...")
-            # Create question tasks
-            expander_question_task = self.reader_tasks.reader_question(knowledge_expander, topic)
-            keeper_question_task = self.reader_tasks.reader_question(inherent_knowledge_keeper, topic)
-            integrator_question_task = self.reader_tasks.reader_question(multidimensional_integrator, topic)
-            
-            # Run initial question tasks
-            print("🚀 Running initial question tasks...")
-            initial_crew = Crew(
-                agents=[knowledge_expander, inherent_knowledge_keeper, multidimensional_integrator],
-                tasks=[expander_question_task, keeper_question_task, integrator_question_task],
-                verbose=True,
-                process=Process.sequential
-            )
-            
-            questions_output = initial_crew.kickoff()
-            print(f"Questions output type: {type(questions_output)}")
-            
-            expander_question = self.safe_get_output(questions_output, expander_question_task.id, 0)
-            keeper_question = self.safe_get_output(questions_output, keeper_question_task.id, 1)
-            integrator_question = self.safe_get_output(questions_output, integrator_question_task.id, 2)
-            
-            # Create book description tasks
-            expander_description_task = self.reader_tasks.book_description(
-                knowledge_expander, expander_question
-            )
-            keeper_description_task = self.reader_tasks.book_description(
-                inherent_knowledge_keeper, keeper_question
-            )
-            integrator_description_task = self.reader_tasks.book_description(
-                multidimensional_integrator, integrator_question
-            )
-            
-            # Run book description tasks
-            print("🚀 Running book description tasks...")
-            description_crew = Crew(
-                agents=[knowledge_expander, inherent_knowledge_keeper, multidimensional_integrator],
-                tasks=[expander_description_task, keeper_description_task, integrator_description_task],
-                verbose=True,
-                process=Process.sequential
-            )
-            
-            descriptions_output = description_crew.kickoff()
-            print(f"Descriptions output type: {type(descriptions_output)}")
-            
-            expander_description = self.safe_get_output(descriptions_output, expander_description_task.id, 0)
-            keeper_description = self.safe_get_output(descriptions_output, keeper_description_task.id, 1)
-            integrator_description = self.safe_get_output(descriptions_output, integrator_description_task.id, 2)
+            timeout = phase_budget("search", self.phase_timeouts.get("search", self.phase_timeouts.get("default")))
+        except PhaseTimeout:
+            timeout = 0
+        try:
+            results, scores = prefetch.result(timeout)
+        except FutureTimeoutError:
+            print("⏱️ Catalog prefetch is still running; searching without it")
+            return {}
+        except Exception as e:
+            print(f"Error prefetching catalog candidates: {e}")
+            return {}
+        return {topic: (results, scores)} if len(results) else {}
+    
+    def _fast_search(self, demand_analysis, fallback_keywords=(), known_hits=None):
+        """Run the demand analysis keywords against the catalog; None when no keywords could be parsed"""
+        keywords = parse_keywords(str(demand_analysis)) or list(fallback_keywords)
+        if not keywords:
+            print("⚠️ No keywords found in the demand analysis, falling back to the Retrieval Specialist")
+            return None
+        print(f"⚡ Searching the catalog directly for: {', '.join(keywords)}")
+        with self.profiler.span("search", "crew", mode="fast_path"):
+            books = self.library_tools.search_keywords(keywords, known_hits=known_hits)
+        if not books:
+            return f"No books found in the library for keywords: {', '.join(keywords)}"
+        return self.library_tools.encode_books("search_keywords", books, as_text=True)
+    
+    def _report_issue(self, status, message):
+        """Record that the running request failed ("error") or fell back ("degraded") somewhere"""
+        issues = _request_issues.get()
+        if issues is not None:
+            issues.append((status, message))
+    
+    def _emit(self, on_event, event_type, content, **fields):
+        """Send a pipeline event to the caller's callback, if any"""
+        if on_event is None:
+            return
+        try:
+            on_event({"type": event_type, "content": content, **fields})
+        except Exception as e:
+            print(f"Error emitting {event_type} event: {e}")
+    
+    @contextmanager
+    def _stream_tokens(self, on_event):
+        """Forward LLM chunks produced by this request as "token" events"""
+        if on_event is None or crewai_event_bus is None:
+            yield
+            return
+        token = _token_sink.set(lambda chunk: self._emit(on_event, "token", chunk))
+        try:
+            yield
+        finally:
+            _token_sink.reset(token)
+    
+    @contextmanager
+    def _llm_streaming(self):
+        """Turn on llm.stream for the duration of a streaming request, then restore it.
+        
+        Streaming only changes how the LLM delivers its answer, not the answer
+        itself. The LLM is shared, so the flag stays on until the last
+        overlapping streaming request is done."""
+        if crewai_event_bus is None:
+            print("⚠️ This crewAI version has no event bus; streaming falls back to the complete answer")
+            yield
+            return
+        if not hasattr(self.llm, "stream"):
+            yield
+            return
+        with self._stream_lock:
+            if self._streaming_requests == 0:
+                self._stream_previous = self.llm.stream
+                self.llm.stream = True
+            self._streaming_requests += 1
+        try:
+            yield
+        finally:
+            with self._stream_lock:
+                self._streaming_requests -= 1
+                if self._streaming_requests == 0:
+                    self.llm.stream = self._stream_previous
+    
+    def _run_reader_perspectives_sequential(self, agent_set, readers, topic, on_event=None):
+        """Run the question and description phases with one sequential crew per phase"""
+        knowledge_expander, inherent_knowledge_keeper, multidimensional_integrator = readers
+        
+        print("📝 Creating reader tasks...")
+        # Create question tasks
+        expander_question_task = self.reader_tasks.reader_question(knowledge_expander, topic)
+        keeper_question_task = self.reader_tasks.reader_question(inherent_knowledge_keeper, topic)
+        integrator_question_task = self.reader_tasks.reader_question(multidimensional_integrator, topic)
+        
+        # Run initial question tasks
+        print("🚀 Running initial question tasks...")
+        initial_crew = agent_set.crew(
+            "reader_question",
+            [expander_question_task, keeper_question_task, integrator_question_task],
+            process=Process.sequential
+        )
+        
+        questions_output = self._kickoff(initial_crew, "reader_question")
+        print(f"Questions output type: {type(questions_output)}")
+        
+        expander_question = self.safe_get_output(questions_output, expander_question_task.id, 0)
+        keeper_question = self.safe_get_output(questions_output, keeper_question_task.id, 1)
+        integrator_question = self.safe_get_output(questions_output, integrator_question_task.id, 2)
+        for agent, question in zip(readers, [expander_question, keeper_question, integrator_question]):
+            self._emit(on_event, "question", str(question), agent=agent.role)
+        
+        # Create book description tasks
+        expander_description_task = self.reader_tasks.book_description(
+            knowledge_expander, expander_question
+        )
+        keeper_description_task = self.reader_tasks.book_description(
+            inherent_knowledge_keeper, keeper_question
+        )
+        integrator_description_task = self.reader_tasks.book_description(
+            multidimensional_integrator, integrator_question
+        )
+        
+        # Run book description tasks
+        print("🚀 Running book description tasks...")
+        description_crew = agent_set.crew(
+            "book_description",
+            [expander_description_task, keeper_description_task, integrator_description_task],
+            process=Process.sequential
+        )
+        
+        descriptions_output = self._kickoff(description_crew, "book_description")
+        print(f"Descriptions output type: {type(descriptions_output)}")
+        
+        expander_description = self.safe_get_output(descriptions_output, expander_description_task.id, 0)
+        keeper_description = self.safe_get_output(descriptions_output, keeper_description_task.id, 1)
+        integrator_description = self.safe_get_output(descriptions_output, integrator_description_task.id, 2)
+        for agent, description in zip(readers, [expander_description, keeper_description, integrator_description]):
+            self._emit(on_event, "description", str(description), agent=agent.role)
+        
+        return expander_description, keeper_description, integrator_description
+    
+    def _run_reader_perspective(self, agent_set, agent, topic, on_event=None):
+        """Run one reader's question task and then its book description task"""
+        question_task = self.reader_tasks.reader_question(agent, topic)
+        question_crew = agent_set.crew(("reader_question", agent.role), [question_task])
+        question_output = self._kickoff(question_crew, "reader_question", agent=agent.role)
+        question = self.safe_get_output(question_output, question_task.id, 0)
+        self._emit(on_event, "question", str(question), agent=agent.role)
+        
+        description_task = self.reader_tasks.book_description(agent, question)
+        description_crew = agent_set.crew(("book_description", agent.role), [description_task])
+        description_output = self._kickoff(description_crew, "book_description", agent=agent.role)
+        description = self.safe_get_output(description_output, description_task.id, 0)
+        self._emit(on_event, "description", str(description), agent=agent.role)
+        return description
+    
+    def _run_reader_perspectives_parallel(self, agent_set, readers, topic, on_event=None):
+        """Fan the independent reader perspectives out over a thread pool and join their descriptions"""
+        pool = ThreadPoolExecutor(max_workers=len(readers), thread_name_prefix="reader")
+        try:
+            # Each worker runs in a copy of the caller's context so its spans nest under this request
+            futures = [
+                pool.submit(contextvars.copy_context().run, self._run_reader_perspective, agent_set, agent, topic, on_event)
+                for agent in readers
+            ]
+            # Return as soon as one perspective fails rather than after the slowest sibling
+            wait(futures, return_when=FIRST_EXCEPTION)
+            for future in futures:
+                if future.done() and future.exception() is not None:
+                    future.result()  # re-raises the failure
+            descriptions = [future.result() for future in futures]
+        except PhaseTimeout as e:
+            # Fall back now; perspectives still running finish in the background on abandoned agents
+            e.still_running = e.still_running or not all(future.done() for future in futures)
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+        except BaseException:
+            pool.shutdown(cancel_futures=True)
+            raise
+        pool.shutdown()
+        return descriptions
+    
+    def run_reader_crew(self, topic, on_event=None):
+        # Lease a set of reader agents so concurrent requests never share one
+        agent_set = self.reader_pool.acquire()
+        try:
+            print("🧠 Using pooled reader agents...")
+            knowledge_expander = agent_set["knowledge_expander"]
+            inherent_knowledge_keeper = agent_set["inherent_knowledge_keeper"]
+            multidimensional_integrator = agent_set["multidimensional_integrator"]
+            
+            readers = [knowledge_expander, inherent_knowledge_keeper, multidimensional_integrator]
+            if self.parallel_readers:
+                print("🚀 Running reader perspectives in parallel...")
+                descriptions = self._run_reader_perspectives_parallel(agent_set, readers, topic, on_event)
+            else:
+                descriptions = self._run_reader_perspectives_sequential(agent_set, readers, topic, on_event)
+            expander_description, keeper_description, integrator_description = descriptions
             
             # Format final requirements
             print("📋 Formatting final requirements...")
@@ -138,34 +444,32 @@ class LibrarySystem:
                 integrator_description       # Integrator's perspective
             )
             
-            format_crew = Crew(
-                agents=[multidimensional_integrator],
-                tasks=[format_task],
-                verbose=True
-            )
+            format_crew = agent_set.crew("format_final_requirements", [format_task])
             
-            format_output = format_crew.kickoff()
+            format_output = self._kickoff(format_crew, "format_final_requirements")
             formatted_requirements = self.safe_get_output(format_output, format_task.id, 0)
             
             return formatted_requirements
+        except PhaseTimeout as e:
+            return self._fallback(e, on_event, self._fallback_requirements(topic), agent_set)
         except Exception as e:
             print(f"Error in reader crew: {e}")
+            self._report_issue("error", f"reader crew: {e}")
             # Fallback formatted requirements
-            return f"""
-            1. Requirement for exploring emerging trends in {topic}.
-            2. Requirement for understanding core principles of {topic}.
-            3. Requirement for connecting {topic} with other disciplines.
-            """
+            return self._fallback_requirements(topic)
+        finally:
+            self.reader_pool.release(agent_set)
     
-    def run_employee_crew(self, requirements, topic):
+    def run_employee_crew(self, requirements, topic, on_event=None, prefetch=None):
+        # Lease a set of employee agents so concurrent requests never share one
+        agent_set = self.employee_pool.acquire()
         try:
-            print("👥 Creating employee agents...")
-            # Create agents
-            demand_assistant = self.employee_agents.create_demand_assistant()
-            retrieval_assistant = self.employee_agents.create_retrieval_assistant()
-            organization_assistant = self.employee_agents.create_organization_assistant()
-            collection_assistant = self.employee_agents.create_collection_assistant()
-            recommendation_assistant = self.employee_agents.create_recommendation_assistant()
+            print("👥 Using pooled employee agents...")
+            demand_assistant = agent_set["demand_assistant"]
+            retrieval_assistant = agent_set["retrieval_assistant"]
+            organization_assistant = agent_set["organization_assistant"]
+            collection_assistant = agent_set["collection_assistant"]
+            recommendation_assistant = agent_set["recommendation_assistant"]
             
             print("📋 Analyzing requirements...")
             # Analyze requirements
@@ -176,36 +480,52 @@ class LibrarySystem:
                 reader_focus=topic
             )
             
-            demand_crew = Crew(
-                agents=[demand_assistant],
-                tasks=[demand_task],
-                verbose=True
-            )
+            demand_crew = agent_set.crew("demand_translation", [demand_task])
             
-            demand_output = demand_crew.kickoff()
-            demand_analysis = self.safe_get_output(demand_output, demand_task.id, 0)
+            try:
+                demand_output = self._kickoff(demand_crew, "demand_translation")
+                demand_analysis = self.safe_get_output(demand_output, demand_task.id, 0)
+            except PhaseTimeout as e:
+                # The topic itself becomes the only search keyword
+                demand_analysis = self._fallback(e, on_event, f"Title keywords:\n- {topic}", agent_set)
+            self._emit(on_event, "demand_analysis", str(demand_analysis))
             
             print("🔍 Searching for resources...")
-            # Search for resources
-            search_task = self.employee_tasks.search(
-                retrieval_assistant,
-                requirements,
-                demand_analysis,
-                file_path="data/lite_library.csv",
-                reader_role="Topic Explorer",
-                reader_focus=topic
-            )
-            
-            search_crew = Crew(
-                agents=[retrieval_assistant],
-                tasks=[search_task],
-                verbose=True
-            )
-            
-            search_output = search_crew.kickoff()
-            print(f"Search output type: {type(search_output)}")
-            # Add more defensive handling here
-            search_results = self.safe_get_output(search_output, search_task.id, 0)
+            # Candidates ranked for the raw topic while the earlier phases ran
+            prefetched_hits = self._prefetched_hits(prefetch, topic)
+            search_results = self._fast_search(demand_analysis, known_hits=prefetched_hits) if self.fast_retrieval else None
+            if search_results is None:
+                candidates = None
+                if prefetched_hits:
+                    candidates = self.library_tools.encode_books(
+                        "prefetch", self.library_tools.search_keywords([], known_hits=prefetched_hits), as_text=True
+                    )
+                # Search for resources
+                search_task = self.employee_tasks.search(
+                    retrieval_assistant,
+                    requirements,
+                    demand_analysis,
+                    file_path=self.library_path,
+                    reader_role="Topic Explorer",
+                    reader_focus=topic,
+                    candidates=candidates
+                )
+                
+                search_crew = agent_set.crew("search", [search_task])
+                
+                try:
+                    search_output = self._kickoff(search_crew, "search")
+                    print(f"Search output type: {type(search_output)}")
+                    # Add more defensive handling here
+                    search_results = self.safe_get_output(search_output, search_task.id, 0)
+                except PhaseTimeout as e:
+                    # Direct catalog search needs no LLM call
+                    search_results = self._fallback(
+                        e, on_event,
+                        self._fast_search(demand_analysis, fallback_keywords=[topic], known_hits=prefetched_hits),
+                        agent_set
+                    )
+            self._emit(on_event, "search_results", str(search_results))
             
             print("📊 Organizing search results...")
             # Organize results
@@ -217,14 +537,14 @@ class LibrarySystem:
                 reader_focus=topic
             )
             
-            organization_crew = Crew(
-                agents=[organization_assistant],
-                tasks=[organization_task],
-                verbose=True
-            )
+            organization_crew = agent_set.crew("employee_organization", [organization_task])
             
-            organization_output = organization_crew.kickoff()
-            organized_results = self.safe_get_output(organization_output, organization_task.id, 0)
+            try:
+                organization_output = self._kickoff(organization_crew, "employee_organization")
+                organized_results = self.safe_get_output(organization_output, organization_task.id, 0)
+            except PhaseTimeout as e:
+                organized_results = self._fallback(e, on_event, search_results, agent_set)
+            self._emit(on_event, "organized_results", str(organized_results))
             
             print("📚 Managing library collection...")
             # Collection management
@@ -232,17 +552,17 @@ class LibrarySystem:
                 collection_assistant,
                 requirements,
                 organized_results,
-                file_path="data/lite_library.csv"
+                file_path=self.library_path
             )
             
-            collection_crew = Crew(
-                agents=[collection_assistant],
-                tasks=[collection_task],
-                verbose=True
-            )
+            collection_crew = agent_set.crew("employee_collaboration", [collection_task])
             
-            collection_output = collection_crew.kickoff()
-            collection_results = self.safe_get_output(collection_output, collection_task.id, 0)
+            try:
+                collection_output = self._kickoff(collection_crew, "employee_collaboration")
+                collection_results = self.safe_get_output(collection_output, collection_task.id, 0)
+            except PhaseTimeout as e:
+                collection_results = self._fallback(e, on_event, organized_results, agent_set)
+            self._emit(on_event, "collection_results", str(collection_results))
             
             print("📝 Generating final recommendations...")
             # Final recommendations
@@ -255,41 +575,135 @@ class LibrarySystem:
                 reader_focus=topic
             )
             
-            recommendation_crew = Crew(
-                agents=[recommendation_assistant],
-                tasks=[recommendation_task],
-                verbose=True
-            )
+            recommendation_crew = agent_set.crew("results_and_feedback", [recommendation_task])
             
-            recommendation_output = recommendation_crew.kickoff()
-            final_recommendations = self.safe_get_output(recommendation_output, recommendation_task.id, 0)
+            try:
+                with self._stream_tokens(on_event):
+                    recommendation_output = self._kickoff(recommendation_crew, "results_and_feedback")
+                final_recommendations = self.safe_get_output(recommendation_output, recommendation_task.id, 0)
+            except PhaseTimeout as e:
+                final_recommendations = self._fallback(
+                    e, on_event,
+                    f"Based on your interest in {topic}, these are the closest matches in our catalog:\n{collection_results}",
+                    agent_set
+                )
             
             return final_recommendations
         except Exception as e:
             print(f"Error in employee crew: {e}")
+            self._report_issue("error", f"employee crew: {e}")
             return f"Based on your interest in {topic}, we recommend exploring our catalog for related books."
+        finally:
+            self.employee_pool.release(agent_set)
+    
+    def recommend_books(self, topic, on_event=None):
+        """Run the full pipeline for a topic.
+
+        If `on_event` is given it is called with a dict ({"type", "content", ...})
+        for every intermediate result: reader questions and descriptions,
+        requirements, demand analysis, search results, organized and collection
+        results, streamed tokens of the final answer, and the recommendations.
+        A per-phase profile of the run is printed at the end.
+        
+        The result's "status" is "ok"; "degraded" when a phase ran over its
+        deadline and fallback text stood in for it; or "error" when a crew
+        failed. Both carry an "error" message and are never cached."""
+        issues_token = _request_issues.set([])
+        try:
+            with self.profiler.span("recommend_books", "run", topic=topic) as run, \
+                    request_deadline(self.request_timeout):
+                results = self._recommend_books(topic, on_event)
+        finally:
+            _request_issues.reset(issues_token)
+        self.profiler.print_summary(run.run_id)
+        if self.request_timeout is not None and run.duration > self.request_timeout:
+            run.attributes["slo_exceeded"] = True
+            print(f"⚠️ Request took {run.duration:.1f}s, over its {self.request_timeout:.1f}s budget")
+        return results
     
-    def recommend_books(self, topic):
+    def _recommend_books(self, topic, on_event=None):
         try:
             print(f"🎯 Processing topic: {topic}")
             
+            if self.topic_cache is not None:
+                cached = self.topic_cache.get(topic)
+                if cached is not None:
+                    print("♻️ Reusing recommendations from a previous matching topic")
+                    self._emit(on_event, "requirements", cached["requirements"], cached=True)
+                    self._emit(on_event, "recommendations", cached["recommendations"], cached=True)
+                    return {**cached, "status": "ok"}
+            
+            # Catalog retrieval on the raw topic overlaps with the reader crew's LLM calls
+            prefetch = self._start_prefetch(topic)
+            
             # Run reader crew
             print("\n==== READER ANALYSIS PHASE ====")
-            requirements = self.run_reader_crew(topic)
+            requirements = self.run_reader_crew(topic, on_event)
             print(f"\n📋 Requirements generated:\n{requirements}\n")
+            self._emit(on_event, "requirements", str(requirements))
             
             # Run employee crew
             print("\n==== EMPLOYEE RECOMMENDATION PHASE ====")
-            recommendations = self.run_employee_crew(requirements, topic)
+            recommendations = self.run_employee_crew(requirements, topic, on_event, prefetch)
             print(f"\n📚 Book recommendations ready!")
+            self._emit(on_event, "recommendations", str(recommendations))
             
-            return {
+            results = {
                 "requirements": requirements,
                 "recommendations": recommendations
             }
+            issues = _request_issues.get() or []
+            errors = [message for status, message in issues if status == "error"]
+            if errors:
+                results["status"] = "error"
+                results["error"] = "; ".join(errors)
+                return results
+            if issues:
+                # Fallback text stood in for a phase; serve it but do not let it answer later topics
+                results["status"] = "degraded"
+                results["error"] = "; ".join(message for _, message in issues)
+                return results
+            results["status"] = "ok"
+            if self.topic_cache is not None:
+                self.topic_cache.put(topic, {key: str(value) for key, value in results.items()})
+            return results
         except Exception as e:
             print(f"❌ Error in recommendation process: {e}")
             return {
                 "requirements": f"Could not generate requirements for {topic}.",
-                "recommendations": f"We encountered an error while generating recommendations for {topic}. Please try again or choose a different topic."
-            }
\ No newline at end of file
+                "recommendations": f"We encountered an error while generating recommendations for {topic}. Please try again or choose a different topic.",
+                "status": "error",
+                "error": str(e)
+            }
+    
+    def recommend_books_stream(self, topic):
+        """Generator version of recommend_books yielding pipeline events as they happen.
+        
+        The last event has type "done" and carries the same dict recommend_books returns."""
+        events = queue.Queue()
+        
+        def run():
+            try:
+                with self._llm_streaming():
+                    results = self.recommend_books(topic, on_event=events.put)
+                events.put({"type": "done", "content": results})
+            except BaseException as e:
+                events.put({"type": "error", "content": str(e)})
+        
+        worker = threading.Thread(target=run, name="recommend-stream", daemon=True)
+        worker.start()
+        while True:
+            event = events.get()
+            yield event
+            if event["type"] in ("done", "error"):
+                break
+        worker.join()
+    
+    async def arecommend_books_stream(self, topic):
+        """Async iterator over the same events as recommend_books_stream"""
+        stream = self.recommend_books_stream(topic)
+        while True:
+            event = await asyncio.to_thread(next, stream, None)
+            if event is None:
+                break
+            yield event
@@ -3,13 +3,21 @@ import yaml
 from crewai import Task
 
 class EmployeeTasks:
-    def __init__(self):
+    def __init__(self, budgeter=None):
         self.config = self._load_config()
+        # Optional ContextBudgeter trimming the previous outputs chained into each task
+        self.budgeter = budgeter
 
     def _load_config(self):
         with open("config/employee_tasks.yaml", "r") as file:
             return yaml.safe_load(file)
 
+    def _fit(self, task_name, *parts):
+        """Trim previous outputs (oldest first) to the task's context budget"""
+        if self.budgeter is None:
+            return parts
+        return self.budgeter.fit(task_name, *parts)
+
     def demand_translation(self, agent, query, reader_role="General Reader", reader_focus="Various Topics"):
         config = self.config["demand_translation"]
         return Task(
@@ -22,7 +30,14 @@ class EmployeeTasks:
             agent=agent
         )
 
-    def search(self, agent, requirements, demand_analysis, file_path="data/lite_library.csv", reader_role="", reader_focus=""):
+    def search(self, agent, requirements, demand_analysis, file_path="data/lite_library.csv", reader_role="", reader_focus="",
+               candidates=None):
+        requirements, demand_analysis, candidates = self._fit("search", requirements, demand_analysis, candidates)
+        candidate_note = f"""
+            Candidate books already retrieved from the catalog for the topic:
+            {candidates}
+            Re-rank and extend these candidates instead of searching from scratch.
+            """ if candidates else ""
         return Task(
             description=f"""
             Perform a comprehensive search for relevant resources based on demand "{requirements}":
@@ -33,9 +48,9 @@ class EmployeeTasks:
             Consider the reader's perspective: {reader_role} with focus on {reader_focus}
             
             First, analyze what key terms would be most relevant to search for based on the requirements.
-            Then, search using those specific terms.
+            Then, search using those specific terms, passing them all in a single call to the batch search tool.
             If no results are found in the library, provide recommendations for books that could be added.
-            """,
+            {candidate_note}""",
             expected_output="Output a list containing all findings, with each entry including resource details and source",
             agent=agent,
             context=[
@@ -48,6 +63,7 @@ class EmployeeTasks:
 
     def employee_organization(self, agent, query, search_results, reader_role="General Reader", reader_focus="Various Topics"):
         config = self.config["employee_organization"]
+        query, search_results = self._fit("employee_organization", query, search_results)
         return Task(
             description=config["description"].format(
                 query=query,
@@ -61,6 +77,7 @@ class EmployeeTasks:
 
     def employee_collaboration(self, agent, query, organized_results, file_path="data/lite_library.csv"):
         config = self.config["employee_collaboration"]
+        query, organized_results = self._fit("employee_collaboration", query, organized_results)
         return Task(
             description=config["description"].format(
                 query=query,
@@ -73,6 +90,7 @@ class EmployeeTasks:
 
     def results_and_feedback(self, agent, query, final_list, demand_analysis, reader_role="General Reader", reader_focus="Various Topics"):
         config = self.config["results_and_feedback"]
+        query, demand_analysis, final_list = self._fit("results_and_feedback", query, demand_analysis, final_list)
         return Task(
             description=config["description"].format(
                 query=query,
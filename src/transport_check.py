@@ -0,0 +1,171 @@
+import argparse
+import asyncio
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+from src.utils.llm_transport import AsyncLLMTransport, LLMTransportError
+
+
+class StubChatServer:
+    """Local OpenAI-compatible /chat/completions endpoint for exercising the transport.
+
+    It echoes the last message and the stop sequences after `delay_seconds`;
+    a prompt of "flaky" is answered with HTTP 503 `failures` times first."""
+
+    def __init__(self, delay_seconds=0.2, failures=2):
+        self.delay_seconds = delay_seconds
+        self.failures = failures
+        self.requests = 0
+        self._lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with stub._lock:
+                    stub.requests += 1
+                    fail = body["messages"][-1]["content"] == "flaky" and stub.failures > 0
+                    stub.failures -= fail
+                if fail:
+                    self.send_response(503)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                time.sleep(stub.delay_seconds)
+                content = f"echo:{body['messages'][-1]['content']}|stop={body.get('stop')}"
+                usage = {"prompt_tokens": 7, "completion_tokens": 3, "total_tokens": 10,
+                         "prompt_tokens_details": {"cached_tokens": 0}}
+                output = json.dumps({"choices": [{"message": {"content": content}}], "usage": usage}).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(output)))
+                self.end_headers()
+                self.wfile.write(output)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, name="stub-chat-server", daemon=True).start()
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server.server_port}/v1"
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class StubLLM:
+    """Stands in for crewAI's LLM: the attributes install() reads and a call that marks the original path."""
+
+    def __init__(self, model="ollama/llama3", stream=False):
+        self.model = model
+        self.temperature = None
+        self.max_tokens = None
+        self.stop = ["\nObservation:"]
+        self.stream = stream
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, **kwargs):
+        return "original"
+
+
+class StubTokenCounter:
+    """Mirrors crewAI's TokenCalcHandler, which agents pass as the only callback of every call."""
+
+    def __init__(self):
+        self.token_cost_process = SimpleNamespace(prompt_tokens=0, completion_tokens=0, successful_requests=0)
+
+    def log_success_event(self, kwargs, response_obj, start_time, end_time):
+        usage = response_obj["usage"]
+        self.token_cost_process.successful_requests += 1
+        self.token_cost_process.prompt_tokens += usage.prompt_tokens
+        self.token_cost_process.completion_tokens += usage.completion_tokens
+
+
+def run_checks(delay_seconds=0.2):
+    """Run the transport against a stub server; returns (name, passed, detail) per check."""
+    server = StubChatServer(delay_seconds=delay_seconds)
+    transport = AsyncLLMTransport(server.base_url, max_in_flight=4, backoff_seconds=0.05)
+    results = []
+
+    def check(name, passed, detail=""):
+        results.append((name, bool(passed), detail))
+
+    try:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(8) as pool:
+            answers = list(pool.map(lambda _: transport.complete("llama3", "same"), range(8)))
+        check("identical concurrent prompts are sent once",
+              server.requests == 1 and answers == ["echo:same|stop=None"] * 8,
+              f"{server.requests} request(s) in {time.perf_counter() - start:.2f}s")
+
+        answer = transport.complete("llama3", "flaky")
+        check("HTTP 503 is retried", answer.startswith("echo:flaky") and transport.stats["retries"] == 2,
+              f"{transport.stats['retries']} retries")
+
+        async def gather():
+            return await asyncio.gather(*[transport.acomplete("llama3", f"q{index}") for index in range(8)])
+
+        start = time.perf_counter()
+        answers = asyncio.run(gather())
+        elapsed = time.perf_counter() - start
+        # 8 requests through 4 slots take two rounds of the server delay
+        check("async requests are capped at max_in_flight",
+              len(answers) == 8 and elapsed >= 2 * delay_seconds * 0.9, f"{elapsed:.2f}s")
+
+        llm = transport.install(StubLLM())
+        answer = llm.call([{"role": "user", "content": "hi"}])
+        check("llm.call goes through the transport with the stop sequences",
+              answer == "echo:hi|stop=['\\nObservation:']", answer)
+        check("tool calls keep the original path",
+              llm.call("hi", tools=[{"name": "search"}], available_functions={}) == "original")
+        # The shape of crewAI's agent executor call: messages plus the token counter callback
+        counter = StubTokenCounter()
+        answer = llm.call([{"role": "user", "content": "agent"}], callbacks=[counter], available_functions=None)
+        check("agent calls with the token counter use the transport", answer.startswith("echo:agent"), answer)
+        check("the token counter receives the server's usage",
+              (counter.token_cost_process.prompt_tokens, counter.token_cost_process.completion_tokens) == (7, 3),
+              str(vars(counter.token_cost_process)))
+        check("calls with other callbacks keep the original path",
+              llm.call("hi", callbacks=[counter, print]) == "original")
+        llm.stream = True
+        check("streaming calls keep the original path", llm.call("hi") == "original")
+
+        unreachable = AsyncLLMTransport("http://127.0.0.1:1/v1", max_retries=1, backoff_seconds=0.01)
+        try:
+            unreachable.complete("llama3", "x")
+            check("an unreachable server raises LLMTransportError", False)
+        except LLMTransportError as e:
+            check("an unreachable server raises LLMTransportError", True, str(e)[:80])
+        finally:
+            unreachable.close()
+    finally:
+        transport.close()
+        server.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check AsyncLLMTransport against a local stub chat completion server.")
+    parser.add_argument("--delay", type=float, default=0.2, help="Seconds the stub server takes per answer")
+    args = parser.parse_args()
+
+    results = run_checks(delay_seconds=args.delay)
+    for name, passed, detail in results:
+        print(f"{'✅' if passed else '❌'} {name}" + (f" ({detail})" if detail else ""))
+    failed = sum(not passed for _, passed, _ in results)
+    print(f"\n{len(results) - failed}/{len(results)} transport checks passed")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
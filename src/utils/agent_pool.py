@@ -0,0 +1,86 @@
+import threading
+from contextlib import contextmanager
+
+from crewai import Crew
+
+
+class AgentSet:
+    """One instance of every agent in a pool, plus the crews built around them.
+
+    A set is leased to a single request at a time, so the per-execution state
+    crewAI keeps on agents and crews never sees two requests at once."""
+
+    def __init__(self, agents):
+        self.agents = agents
+        self._crews = {}
+        # Set when a phase overran its deadline and may still be running on these
+        # agents in the background; the pool then drops the set instead of reusing it
+        self.abandoned = False
+
+    def __getitem__(self, name):
+        return self.agents[name]
+
+    def crew(self, key, tasks, **crew_options):
+        """Return the crew cached under `key`, pointed at this request's tasks.
+
+        The crew and its agents are built on first use; later requests only
+        swap in their own Task objects, which carry the request's descriptions,
+        context and outputs."""
+        crew = self._crews.get(key)
+        if crew is None:
+            agents = list({id(task.agent): task.agent for task in tasks}.values())
+            crew = Crew(agents=agents, tasks=list(tasks), verbose=True, **crew_options)
+            self._crews[key] = crew
+        else:
+            crew.tasks = list(tasks)
+        return crew
+
+
+class AgentPool:
+    """Builds agents once and lends whole sets of them to requests.
+
+    Usage:
+        pool = AgentPool({"demand": agents.create_demand_assistant})
+        with pool.lease() as agent_set:
+            task = tasks.demand_translation(agent_set["demand"], requirements)
+            agent_set.crew("demand_translation", [task]).kickoff()
+
+    Idle sets are reused across topics and threads; a new set is only built
+    when every existing one is leased, so the pool grows to the peak number
+    of concurrent requests and no further."""
+
+    def __init__(self, factories):
+        self.factories = factories
+        self._idle = []
+        self._lock = threading.Lock()
+        self.created = 0
+
+    def _build(self):
+        agents = {name: factory() for name, factory in self.factories.items()}
+        with self._lock:
+            self.created += 1
+        return AgentSet(agents)
+
+    def acquire(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return self._build()
+
+    def release(self, agent_set):
+        if agent_set.abandoned:
+            return
+        with self._lock:
+            self._idle.append(agent_set)
+
+    @contextmanager
+    def lease(self):
+        agent_set = self.acquire()
+        try:
+            yield agent_set
+        finally:
+            self.release(agent_set)
+
+    def stats(self):
+        with self._lock:
+            return {"created": self.created, "idle": len(self._idle)}
@@ -0,0 +1,374 @@
+import os
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+
+from src.utils.catalog_snapshot import extend_frame, is_arrow_frame
+from src.utils.title_index import TitleIndex
+
+LIBRARY_COLUMNS = ["Number", "Title", "Call Number", "Author",
+                   "Publication Information", "Content and Summary", "status"]
+SEARCH_FIELDS = ["Title", "Author", "Content and Summary"]
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def tokenize(text):
+    """Split text into lowercase word tokens."""
+    if not isinstance(text, str):
+        return []
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class CatalogState:
+    """One loaded snapshot of the catalog and the index built from it.
+
+    ``postings`` maps a token to the sorted row positions containing it and
+    ``frequencies`` holds the matching term counts, so each token is one
+    column of a sparse document-term matrix."""
+
+    def __init__(self, frame, postings=None, frequencies=None, doc_lengths=None):
+        self.frame = frame
+        self.postings = postings or {}
+        self.frequencies = frequencies or {}
+        self.doc_lengths = doc_lengths if doc_lengths is not None else np.zeros(len(frame))
+        self.length_norm = None
+        self.title_index = None
+        # (rows, dimensions) embedding matrix, mapped on the first semantic query
+        self.vectors = None
+
+
+class CatalogIndex:
+    """Keeps the library catalog in memory together with an inverted index
+    over the searchable fields, reloading both when the CSV changes on disk."""
+
+    def __init__(self, library_path, fields=None, snapshot=None, vectors=None):
+        self.library_path = library_path
+        self.fields = fields or SEARCH_FIELDS
+        # Optional CatalogSnapshot used instead of parsing the CSV on (re)load
+        self.snapshot = snapshot
+        # Optional VectorIndex holding the catalog embeddings for semantic search
+        self.vectors = vectors
+        self._lock = threading.RLock()
+        # Swapped as a whole so readers never mix two loads
+        self._state = None
+        self._signature = None
+
+    def file_signature(self):
+        """Return the (mtime, size) pair used to detect changes to the CSV."""
+        return self._file_signature()
+
+    def _file_signature(self):
+        try:
+            stat = os.stat(self.library_path)
+            return (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return None
+
+    def _read_library(self):
+        if self.snapshot is not None and os.path.exists(self.library_path):
+            try:
+                return self.snapshot.load_frame()
+            except Exception as e:
+                print(f"Error loading catalog snapshot, reading CSV instead: {str(e)}")
+        try:
+            return pd.read_csv(self.library_path)
+        except Exception as e:
+            print(f"Error loading library: {str(e)}")
+            return pd.DataFrame(columns=LIBRARY_COLUMNS)
+
+    def _search_text(self, frame):
+        # One document per row: the searchable fields joined with spaces
+        text = frame[self.fields[0]].fillna("").astype(str)
+        for field in self.fields[1:]:
+            text = text + " " + frame[field].fillna("").astype(str)
+        return text.reset_index(drop=True)
+
+    def _build_state(self, frame):
+        state = CatalogState(frame)
+        if frame.empty:
+            return state
+
+        tokens = self._search_text(frame).str.lower().str.findall(TOKEN_PATTERN.pattern)
+        state.doc_lengths = tokens.str.len().to_numpy(dtype=np.float32)
+        exploded = tokens.explode().dropna()
+        if exploded.empty:
+            return state
+
+        # Encode (token, row) pairs as single integers: sorting them groups
+        # row ids by token, and the run length of each pair is its term count
+        codes, vocabulary = pd.factorize(exploded.to_numpy())
+        n_rows = len(frame)
+        keys = np.sort(codes.astype(np.int64) * n_rows + exploded.index.to_numpy(dtype=np.int64))
+        run_starts = np.flatnonzero(np.concatenate(([True], np.diff(keys) != 0)))
+        counts = np.diff(np.append(run_starts, len(keys))).astype(np.float32)
+        codes, rows = np.divmod(keys[run_starts], n_rows)
+        boundaries = np.flatnonzero(np.diff(codes)) + 1
+        starts = np.concatenate(([0], boundaries))
+        terms = vocabulary[codes[starts]]
+        state.postings = dict(zip(terms, np.split(rows, boundaries)))
+        state.frequencies = dict(zip(terms, np.split(counts, boundaries)))
+        return state
+
+    def _current_state(self):
+        signature = self._file_signature()
+        state = self._state
+        if state is not None and signature == self._signature:
+            return state
+        with self._lock:
+            if self._state is not None and signature == self._signature:
+                return self._state
+            self._state = self._build_state(self._read_library())
+            self._signature = signature
+            return self._state
+
+    def invalidate(self):
+        """Force a reload on the next access."""
+        with self._lock:
+            self._state = None
+            self._signature = None
+
+    def extend(self, rows, previous_signature):
+        """Add rows just appended to the CSV without re-reading the whole file.
+
+        `previous_signature` is the file signature taken, under the write lock,
+        right before the append. If the loaded catalog does not correspond to
+        it, another writer changed the file and it is reloaded on next access."""
+        with self._lock:
+            signature = self._file_signature()
+            vector_rows = None
+            if self.vectors is not None:
+                # Done even when the catalog is not loaded here, so the matrix never needs a full rebuild
+                vector_rows = self.vectors.append(self._search_text(pd.DataFrame(rows)).tolist(), previous_signature, signature)
+
+            state = self._state
+            if state is None or self._signature != previous_signature:
+                self.invalidate()
+                return
+
+            offset = len(state.frame)
+            added = pd.DataFrame(rows, columns=list(state.frame.columns) or LIBRARY_COLUMNS)
+            if offset and is_arrow_frame(state.frame):
+                # Keep the snapshot's column types, so a frame does not change type after a write
+                frame = extend_frame(state.frame, added)
+            else:
+                frame = pd.concat([state.frame, added], ignore_index=True) if offset else added
+            delta = self._build_state(added)
+
+            # Copy-on-write so readers holding the previous state are unaffected
+            postings = dict(state.postings)
+            frequencies = dict(state.frequencies)
+            for token, token_rows in delta.postings.items():
+                token_rows = token_rows + offset
+                if token in postings:
+                    postings[token] = np.concatenate([postings[token], token_rows])
+                    frequencies[token] = np.concatenate([frequencies[token], delta.frequencies[token]])
+                else:
+                    postings[token] = token_rows
+                    frequencies[token] = delta.frequencies[token]
+
+            extended = CatalogState(
+                frame, postings, frequencies,
+                np.concatenate([state.doc_lengths, delta.doc_lengths]).astype(np.float32)
+            )
+            if state.title_index is not None:
+                extended.title_index = state.title_index
+                for title in added["Title"].tolist():
+                    extended.title_index.add(title)
+            if state.vectors is not None and vector_rows == len(frame):
+                extended.vectors = self.vectors.open(vector_rows)
+
+            self._state = extended
+            self._signature = signature
+
+    def frame(self):
+        """Return the cached catalog DataFrame. Callers must not modify it in place."""
+        return self._current_state().frame
+
+    def lookup(self, query):
+        """Return the row positions whose searchable fields contain every token of the query."""
+        return self._lookup(self._current_state(), query)
+
+    def _lookup(self, state, query):
+        postings = [state.postings.get(token) for token in set(tokenize(query))]
+        if not postings or any(p is None for p in postings):
+            return np.empty(0, dtype=np.int64)
+
+        postings.sort(key=len)
+        rows = postings[0]
+        for other in postings[1:]:
+            rows = np.intersect1d(rows, other, assume_unique=True)
+            if rows.size == 0:
+                break
+        return rows
+
+    def search(self, query):
+        """Return the catalog rows matching the query."""
+        state = self._current_state()
+        return state.frame.iloc[self._lookup(state, query)]
+
+    def _title_index(self):
+        state = self._current_state()
+        if state.title_index is None:
+            # Built on first use; most processes never need title lookups
+            with self._lock:
+                if state.title_index is None:
+                    state.title_index = TitleIndex(state.frame["Title"].tolist())
+        return state.title_index
+
+    def find_titles(self, title, threshold=0.7, limit=5):
+        """Return (title, score) pairs for catalog titles that fuzzily match `title`, best first."""
+        return self._title_index().match(title, threshold=threshold, limit=limit)
+
+    def title_containing(self, title):
+        """Return a catalog title containing `title` as whole words (normalized), else None."""
+        return self._title_index().containing(title)
+
+    def search_many(self, queries):
+        """Return the matching rows of each query, all resolved against the same loaded catalog."""
+        state = self._current_state()
+        return [state.frame.iloc[self._lookup(state, query)] for query in queries]
+
+    def rank(self, query, top_k=10, k1=1.5, b=0.75):
+        """Score the catalog against the query with BM25.
+
+        Returns the top_k matching rows (best first) and their scores. Only
+        the postings of the query terms are touched, so the cost depends on
+        how common the terms are rather than on the catalog size."""
+        return self.rank_many([query], top_k=top_k, k1=k1, b=b)[0]
+
+    def rank_many(self, queries, top_k=10, k1=1.5, b=0.75):
+        """BM25-rank several queries in one vectorized pass.
+
+        Returns one (rows, scores) pair per query, as rank() does. The BM25
+        weights of each distinct term are computed once however many queries
+        use it, and the scores of every (query, row) pair are summed in a
+        single sort over all queries."""
+        state = self._current_state()
+        return [(state.frame.iloc[positions], scores) for positions, scores in self._bm25(state, queries, top_k, k1, b)]
+
+    def _bm25(self, state, queries, top_k, k1=1.5, b=0.75):
+        # (row positions, scores) of the top_k BM25 matches of each query
+        n_docs = len(state.frame)
+        empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))
+        query_terms = [
+            [token for token in dict.fromkeys(tokenize(query)) if token in state.postings]
+            for query in queries
+        ]
+        if n_docs == 0 or top_k <= 0 or not any(query_terms):
+            return [empty for _ in queries]
+
+        if state.length_norm is None or state.length_norm[1] != (k1, b):
+            avg_length = max(float(state.doc_lengths.mean()), 1.0)
+            norm = k1 * (1 - b + b * state.doc_lengths / avg_length)
+            state.length_norm = (norm.astype(np.float32), (k1, b))
+        norm = state.length_norm[0]
+
+        weights = {}
+        keys, contributions = [], []
+        for query_id, terms in enumerate(query_terms):
+            for token in terms:
+                if token not in weights:
+                    token_rows = state.postings[token]
+                    tf = state.frequencies[token]
+                    idf = np.log1p((n_docs - len(token_rows) + 0.5) / (len(token_rows) + 0.5))
+                    weights[token] = idf * tf * (k1 + 1) / (tf + norm[token_rows])
+                # (query, row) pairs encoded as one integer so one sort groups both
+                keys.append(query_id * n_docs + state.postings[token])
+                contributions.append(weights[token])
+
+        # Sum the per-term contributions of each candidate (query, row) pair
+        keys = np.concatenate(keys)
+        contributions = np.concatenate(contributions)
+        order = np.argsort(keys, kind="stable")
+        keys, contributions = keys[order], contributions[order]
+        starts = np.flatnonzero(np.concatenate(([True], np.diff(keys) != 0)))
+        query_ids, candidates = np.divmod(keys[starts], n_docs)
+        scores = np.add.reduceat(contributions, starts)
+
+        results = [empty for _ in queries]
+        bounds = np.searchsorted(query_ids, np.arange(len(queries) + 1))
+        for query_id in range(len(queries)):
+            begin, end = bounds[query_id], bounds[query_id + 1]
+            if begin == end:
+                continue
+            query_scores = scores[begin:end]
+            if end - begin > top_k:
+                best = np.argpartition(-query_scores, top_k - 1)[:top_k]
+            else:
+                best = np.arange(end - begin)
+            best = best[np.argsort(-query_scores[best], kind="stable")]
+            results[query_id] = (candidates[begin:end][best], query_scores[best])
+        return results
+
+    def vector_matrix(self):
+        """Return the embedding matrix of the loaded catalog, building or mapping it on first use."""
+        return self._vectors(self._current_state())
+
+    def _vectors(self, state):
+        if state.vectors is None:
+            with self._lock:
+                if state.vectors is None:
+                    # A state that has already been replaced gets vectors built in memory only
+                    signature = self._signature if self._state is state else None
+                    state.vectors = self.vectors.load(
+                        lambda: self._search_text(state.frame).tolist(), len(state.frame), signature
+                    )
+        return state.vectors
+
+    def _cosine(self, state, queries, top_k):
+        # (row positions, cosine similarities) of the top_k nearest rows of each query
+        matrix = self._vectors(state)
+        empty = (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32))
+        if not len(matrix) or top_k <= 0:
+            return [empty for _ in queries], None
+        query_vectors = self.vectors.encoder.encode(queries)
+        # Rows and queries are unit length, so one matrix product gives every cosine similarity
+        similarities = np.asarray(matrix @ query_vectors.T)
+        results = []
+        for query_id in range(len(queries)):
+            scores = similarities[:, query_id]
+            candidates = np.flatnonzero(scores > 0)
+            if len(candidates) > top_k:
+                candidates = candidates[np.argpartition(-scores[candidates], top_k - 1)[:top_k]]
+            candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+            results.append((candidates, scores[candidates]))
+        return results, query_vectors
+
+    def semantic_rank_many(self, queries, top_k=10):
+        """Rank the catalog by cosine similarity between query and book embeddings.
+
+        Returns one (rows, scores) pair per query, best first, like rank_many().
+        Requires a VectorIndex; the matrix is built or mapped on first use."""
+        state = self._current_state()
+        hits, _ = self._cosine(state, queries, top_k)
+        return [(state.frame.iloc[positions], scores) for positions, scores in hits]
+
+    def hybrid_rank_many(self, queries, top_k=10, semantic_weight=0.5, candidates=None):
+        """Rank by a weighted sum of cosine similarity and BM25 score.
+
+        The `candidates` best rows of each ranking (5 x top_k by default) are
+        pooled; BM25 scores are divided by the query's best one so both lie in
+        [0, 1], and a row missing from the BM25 list counts as 0 there. Cosine
+        similarities are exact for every pooled row."""
+        state = self._current_state()
+        candidates = candidates or max(top_k * 5, 50)
+        semantic, query_vectors = self._cosine(state, queries, candidates)
+        keyword = self._bm25(state, queries, candidates)
+        matrix = self._vectors(state)
+        results = []
+        for query_id in range(len(queries)):
+            (semantic_rows, _), (keyword_rows, keyword_scores) = semantic[query_id], keyword[query_id]
+            pooled = np.union1d(semantic_rows, keyword_rows)
+            if not len(pooled):
+                results.append((state.frame.iloc[[]], np.empty(0, dtype=np.float32)))
+                continue
+            cosine = np.maximum(np.asarray(matrix[pooled] @ query_vectors[query_id]), 0)
+            bm25 = np.zeros(len(pooled), dtype=np.float32)
+            if len(keyword_rows):
+                bm25[np.searchsorted(pooled, keyword_rows)] = keyword_scores / keyword_scores.max()
+            fused = semantic_weight * cosine + (1 - semantic_weight) * bm25
+            best = np.argsort(-fused, kind="stable")[:top_k]
+            results.append((state.frame.iloc[pooled[best]], fused[best]))
+        return results
@@ -0,0 +1,107 @@
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.ipc
+except ImportError:
+    pa = None
+
+from src.utils.file_lock import FileLock
+
+# Low-cardinality columns stored dictionary-encoded
+DICTIONARY_COLUMNS = ["Author", "status"]
+
+
+def is_arrow_frame(frame):
+    return any(isinstance(dtype, pd.ArrowDtype) for dtype in frame.dtypes)
+
+
+def _arrow_column(series, arrow_type):
+    values = [None if pd.isna(value) else value for value in series.tolist()]
+    if pa.types.is_large_string(arrow_type):
+        values = [None if value is None else str(value) for value in values]
+    return pa.array(values, from_pandas=True).cast(arrow_type)
+
+
+def extend_frame(frame, added):
+    """Append rows to a frame loaded from a snapshot, keeping its Arrow column types.
+
+    The existing buffers are reused as chunks, so nothing already mapped is
+    copied. A column that cannot hold the new values (text in a numeric
+    column) becomes a string column, as a snapshot rebuilt from the CSV would."""
+    columns = {}
+    for name in frame.columns:
+        existing = pa.chunked_array(frame[name].array.__arrow_array__())
+        new_values = added[name] if name in added else pd.Series([None] * len(added), dtype=object)
+        try:
+            chunks = existing.chunks + [_arrow_column(new_values, existing.type)]
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError, pa.ArrowTypeError):
+            chunks = [existing.cast(pa.large_string()), _arrow_column(new_values, pa.large_string())]
+        columns[name] = pd.arrays.ArrowExtensionArray(pa.chunked_array(chunks))
+    return pd.DataFrame(columns)
+
+
+class CatalogSnapshot:
+    """Compiled Arrow IPC copy of a CSV catalog.
+
+    The snapshot records the mtime and size of the CSV it was built from and
+    is rebuilt when they change. Loading memory-maps the file and wraps the
+    Arrow buffers in a DataFrame without copying, so every process that loads
+    the same snapshot shares one read-only copy through the page cache."""
+
+    def __init__(self, csv_path, snapshot_path=None):
+        self.csv_path = csv_path
+        self.snapshot_path = snapshot_path or f"{os.path.splitext(csv_path)[0]}.arrow"
+
+    @staticmethod
+    def available():
+        return pa is not None
+
+    def _source_metadata(self):
+        stat = os.stat(self.csv_path)
+        return {b"source_mtime_ns": str(stat.st_mtime_ns).encode(), b"source_size": str(stat.st_size).encode()}
+
+    def is_fresh(self):
+        if not os.path.exists(self.snapshot_path):
+            return False
+        try:
+            with pa.memory_map(self.snapshot_path, "r") as source:
+                metadata = pa.ipc.open_file(source).schema.metadata or {}
+            expected = self._source_metadata()
+            return all(metadata.get(key) == value for key, value in expected.items())
+        except (OSError, pa.ArrowInvalid):
+            return False
+
+    def build(self):
+        """Parse the CSV once and write the snapshot atomically."""
+        metadata = self._source_metadata()
+        table = pa.Table.from_pandas(pd.read_csv(self.csv_path), preserve_index=False)
+        for name in DICTIONARY_COLUMNS:
+            if name in table.column_names:
+                position = table.column_names.index(name)
+                table = table.set_column(position, name, pc.dictionary_encode(table.column(name)))
+        table = table.replace_schema_metadata(metadata)
+
+        # Readers that already mapped the previous file keep a valid mapping
+        temp_path = f"{self.snapshot_path}.tmp"
+        with pa.OSFile(temp_path, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(temp_path, self.snapshot_path)
+
+    def load_table(self):
+        """Return the memory-mapped Arrow table, rebuilding the snapshot first if the CSV changed."""
+        if not self.is_fresh():
+            with FileLock(self.snapshot_path):
+                if not self.is_fresh():
+                    print(f"📦 Building catalog snapshot {self.snapshot_path}...")
+                    self.build()
+        source = pa.memory_map(self.snapshot_path, "r")
+        return pa.ipc.open_file(source).read_all()
+
+    def load_frame(self):
+        """Return the catalog as a DataFrame backed by the memory-mapped Arrow buffers."""
+        return self.load_table().to_pandas(types_mapper=pd.ArrowDtype)
@@ -0,0 +1,107 @@
+import threading
+
+from src.utils.instrumentation import CHARS_PER_TOKEN, estimate_tokens
+from src.utils.result_format import truncate
+
+# Below this much room the next line is dropped instead of being cut short
+MIN_PARTIAL_LINE_CHARS = 80
+
+
+def trim_to_tokens(text, max_tokens):
+    """Keep the leading lines of text that fit in max_tokens and note how much was cut.
+
+    Search results, rankings and lists put their most relevant entries first,
+    so keeping whole lines from the top preserves the best material and the
+    header of a TSV table."""
+    tokens = estimate_tokens(text)
+    if tokens <= max_tokens:
+        return text
+    # The marker counts against the budget; sized for the largest count it can report
+    marker = f"[... {tokens} tokens trimmed to fit the context budget]"
+    room_tokens = max_tokens - estimate_tokens(f"\n{marker}")
+    if room_tokens <= 0:
+        # A part allotted too little for any text is reduced to the marker, or left out
+        return marker if estimate_tokens(marker) <= max_tokens else ""
+    max_chars = room_tokens * CHARS_PER_TOKEN
+    kept, size = [], 0
+    for line in text.splitlines():
+        room = max_chars - size
+        if len(line) + 1 > room:
+            # Long paragraphs are cut on a word boundary rather than dropped whole
+            if not kept or room >= MIN_PARTIAL_LINE_CHARS:
+                kept.append(truncate(line, room))
+            break
+        kept.append(line)
+        size += len(line) + 1
+    kept_text = "\n".join(kept)
+    return f"{kept_text}\n[... {tokens - estimate_tokens(kept_text)} tokens trimmed to fit the context budget]"
+
+
+def allocate(tokens, budget, floor):
+    """Split a token budget over parts ordered from oldest to newest.
+
+    Older parts are cut first, each down to `floor` tokens, before newer ones
+    lose anything; if the parts still do not fit they are scaled down together."""
+    allowed = list(tokens)
+    excess = sum(allowed) - budget
+    for position, size in enumerate(allowed):
+        if excess <= 0:
+            break
+        cut = min(excess, max(size - floor, 0))
+        allowed[position] -= cut
+        excess -= cut
+    if excess > 0:
+        scale = budget / sum(allowed)
+        allowed = [int(size * scale) for size in allowed]
+    return allowed
+
+
+class ContextBudgeter:
+    """Keeps the previous outputs chained into a task within a token budget.
+
+    Usage:
+        budgeter = ContextBudgeter(budget_tokens=2000)
+        requirements, search_results = budgeter.fit(
+            "employee_organization", requirements, search_results)
+
+    Parts are passed oldest first. When their estimated total exceeds the
+    budget the oldest are trimmed first, so prompt size stays flat however
+    much a search returned. Every cut is recorded per task in stats()."""
+
+    def __init__(self, budget_tokens=2000, floor_tokens=200, task_budgets=None):
+        self.budget_tokens = budget_tokens
+        # No part is cut below this many tokens while older parts can still give some up
+        self.floor_tokens = floor_tokens
+        # Optional per-task overrides, e.g. {"results_and_feedback": 3000}
+        self.task_budgets = task_budgets or {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def fit(self, task_name, *parts):
+        """Return the parts, trimmed so that together they fit the task's budget."""
+        texts = ["" if part is None else str(part) for part in parts]
+        tokens = [estimate_tokens(text) for text in texts]
+        budget = self.task_budgets.get(task_name, self.budget_tokens)
+        if sum(tokens) <= budget:
+            fitted = texts
+        else:
+            allowed = allocate(tokens, budget, self.floor_tokens)
+            fitted = [trim_to_tokens(text, limit) for text, limit in zip(texts, allowed)]
+        self._record(task_name, sum(tokens), sum(estimate_tokens(text) for text in fitted))
+        return fitted
+
+    def _record(self, task_name, tokens_in, tokens_out):
+        with self._lock:
+            stats = self._stats.setdefault(task_name, {"calls": 0, "trimmed_calls": 0, "tokens_in": 0, "tokens_out": 0})
+            stats["calls"] += 1
+            stats["trimmed_calls"] += tokens_out < tokens_in
+            stats["tokens_in"] += tokens_in
+            stats["tokens_out"] += tokens_out
+
+    def stats(self):
+        """Per task: calls, calls that needed trimming, and estimated tokens before and after."""
+        with self._lock:
+            return {
+                task_name: {**stats, "tokens_cut": stats["tokens_in"] - stats["tokens_out"]}
+                for task_name, stats in self._stats.items()
+            }
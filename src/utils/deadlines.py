@@ -0,0 +1,76 @@
+import contextvars
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
+
+# Monotonic time by which the running request must finish, or None
+_request_deadline = contextvars.ContextVar("request_deadline", default=None)
+
+
+class PhaseTimeout(TimeoutError):
+    """A pipeline phase ran past its deadline or the request's latency budget."""
+
+    def __init__(self, phase, timeout, reason="deadline", still_running=False):
+        super().__init__(f"{phase} exceeded its {reason} ({timeout:.1f}s)")
+        self.phase = phase
+        self.timeout = timeout
+        self.reason = reason
+        # True when the overrunning work keeps going in a background thread
+        self.still_running = still_running
+
+
+@contextmanager
+def request_deadline(seconds):
+    """Give the enclosed request (and worker threads started in a copy of its context) a latency budget."""
+    if seconds is None:
+        yield
+        return
+    token = _request_deadline.set(time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        _request_deadline.reset(token)
+
+
+def remaining_request_time():
+    """Seconds left in the current request's budget, or None when it has none."""
+    deadline = _request_deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def phase_budget(phase, phase_timeout):
+    """Return the time a phase may take: its own timeout capped by what is left of the request budget.
+
+    Raises PhaseTimeout straight away when the request budget is already spent,
+    so the remaining phases fall back without starting any LLM work."""
+    remaining = remaining_request_time()
+    if remaining is None:
+        return phase_timeout
+    if remaining <= 0:
+        raise PhaseTimeout(phase, 0.0, "request budget")
+    return remaining if phase_timeout is None else min(phase_timeout, remaining)
+
+
+def run_with_timeout(function, timeout, name="phase"):
+    """Call function in a daemon thread and wait at most `timeout` seconds for it.
+
+    Python threads cannot be killed, so a call that overruns keeps going in
+    the background and its result is discarded; the caller is released on
+    time either way. The function runs in a copy of the caller's context."""
+    future = Future()
+    context = contextvars.copy_context()
+
+    def run():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(context.run(function))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, name=f"{name}-worker", daemon=True).start()
+    try:
+        return future.result(timeout)
+    except FutureTimeoutError:
+        raise PhaseTimeout(name, timeout, still_running=True) from None
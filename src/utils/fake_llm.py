@@ -0,0 +1,106 @@
+import hashlib
+import json
+import random
+import threading
+import time
+
+from src.utils.instrumentation import estimate_tokens
+
+# Answer for prompts no rule matches; it parses as a keyword list like the Demand Assistant's
+DEFAULT_RESPONSE = "Title keywords:\n- library\n- reading"
+
+
+def prompt_text(messages):
+    """Flatten a prompt (string or chat messages) into one string for matching."""
+    if isinstance(messages, str):
+        return messages
+    return "\n".join(
+        str(message.get("content") or "") if isinstance(message, dict) else str(message)
+        for message in messages
+    )
+
+
+class FakeLLM:
+    """Deterministic offline model backend for benchmarks and development.
+
+    Usage:
+        fake = FakeLLM(responses=[("Demand Assistant", "Title keywords:\\n- gardening")], latency_seconds=0.2)
+        system = LibrarySystem(model_name="fake", llm_transport=fake)   # or fake.install(llm)
+
+    A prompt gets the response of the first rule whose pattern it contains
+    (case-insensitive); a response is a string or a function of the prompt.
+    Rules in `tool_calls` answer with a ReAct tool call instead, until the
+    prompt carries an Observation, so agents exercise their tools. Latency is
+    a fixed delay, plus jitter and a per-token cost derived from the prompt
+    and seed, so a rerun sleeps exactly as long as the first run."""
+
+    def __init__(self, responses=None, default_response=DEFAULT_RESPONSE, tool_calls=None,
+                 latency_seconds=0.0, jitter_seconds=0.0, seconds_per_token=0.0, seed=0, react=True):
+        self.responses = [(pattern.lower(), response) for pattern, response in (responses or [])]
+        self.default_response = default_response
+        # (pattern, tool name, arguments) rules; arguments may also be a function of the prompt
+        self.tool_calls = [(pattern.lower(), name, arguments) for pattern, name, arguments in (tool_calls or [])]
+        self.latency_seconds = latency_seconds
+        self.jitter_seconds = jitter_seconds
+        self.seconds_per_token = seconds_per_token
+        self.seed = seed
+        # crewAI agents parse "Final Answer:" / "Action:" blocks; plain completions need no wrapping
+        self.react = react
+        self._stats = {"calls": 0, "tool_calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "sleep_seconds": 0.0}
+        self._lock = threading.Lock()
+
+    def _delay(self, prompt, completion_tokens):
+        delay = self.latency_seconds + self.seconds_per_token * completion_tokens
+        if self.jitter_seconds:
+            digest = hashlib.sha256(f"{self.seed}:{prompt}".encode("utf-8")).digest()
+            delay += random.Random(digest).uniform(0, self.jitter_seconds)
+        return delay
+
+    def _respond(self, prompt):
+        lowered = prompt.lower()
+        if "observation:" not in lowered:
+            for pattern, name, arguments in self.tool_calls:
+                if pattern in lowered:
+                    arguments = arguments(prompt) if callable(arguments) else arguments
+                    return f"Thought: I should search the catalog\nAction: {name}\nAction Input: {json.dumps(arguments)}", True
+        response = self.default_response
+        for pattern, candidate in self.responses:
+            if pattern in lowered:
+                response = candidate
+                break
+        response = response(prompt) if callable(response) else response
+        if self.react and "Final Answer:" not in response:
+            response = f"Thought: I now can give a great answer\nFinal Answer: {response}"
+        return response, False
+
+    def complete(self, messages):
+        """Return the canned response for a prompt after the simulated latency."""
+        prompt = prompt_text(messages)
+        response, is_tool_call = self._respond(prompt)
+        prompt_tokens, completion_tokens = estimate_tokens(prompt), estimate_tokens(response)
+        delay = self._delay(prompt, completion_tokens)
+        if delay > 0:
+            time.sleep(delay)
+        with self._lock:
+            self._stats["calls"] += 1
+            self._stats["tool_calls"] += is_tool_call
+            self._stats["prompt_tokens"] += prompt_tokens
+            self._stats["completion_tokens"] += completion_tokens
+            self._stats["sleep_seconds"] += delay
+        return response
+
+    def install(self, llm):
+        """Answer llm.call from this backend; no request ever leaves the process."""
+        def fake_call(messages, *args, **kwargs):
+            return self.complete(messages)
+
+        llm.call = fake_call
+        return llm
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats = {name: type(value)() for name, value in self._stats.items()}
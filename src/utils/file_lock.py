@@ -0,0 +1,83 @@
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class _SharedLock:
+    # OS file locks are held per process, so threads of one process are
+    # serialized with an RLock and only the outermost holder takes the OS lock
+    def __init__(self):
+        self.thread_lock = threading.RLock()
+        self.depth = 0
+        self.file = None
+
+
+_shared_locks = {}
+_shared_locks_guard = threading.Lock()
+
+
+def _shared_lock(lock_path):
+    with _shared_locks_guard:
+        return _shared_locks.setdefault(os.path.abspath(lock_path), _SharedLock())
+
+
+class FileLock:
+    """Exclusive, re-entrant lock on `<path>.lock`, shared by threads and processes.
+
+    Usage:
+        with FileLock("data/lite_library.csv"):
+            ...
+    """
+
+    def __init__(self, path):
+        self.lock_path = f"{path}.lock"
+        self._shared = _shared_lock(self.lock_path)
+
+    def acquire(self):
+        shared = self._shared
+        shared.thread_lock.acquire()
+        if shared.depth == 0:
+            try:
+                directory = os.path.dirname(self.lock_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                shared.file = open(self.lock_path, "a+")
+                if fcntl is not None:
+                    fcntl.flock(shared.file.fileno(), fcntl.LOCK_EX)
+                else:
+                    shared.file.seek(0)
+                    msvcrt.locking(shared.file.fileno(), msvcrt.LK_LOCK, 1)
+            except Exception:
+                if shared.file is not None:
+                    shared.file.close()
+                    shared.file = None
+                shared.thread_lock.release()
+                raise
+        shared.depth += 1
+        return self
+
+    def release(self):
+        shared = self._shared
+        shared.depth -= 1
+        if shared.depth == 0:
+            try:
+                if fcntl is not None:
+                    fcntl.flock(shared.file.fileno(), fcntl.LOCK_UN)
+                else:
+                    shared.file.seek(0)
+                    msvcrt.locking(shared.file.fileno(), msvcrt.LK_UNLCK, 1)
+            finally:
+                shared.file.close()
+                shared.file = None
+        shared.thread_lock.release()
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
@@ -0,0 +1,293 @@
+import contextvars
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+# Innermost open span of the running request; copied into worker threads
+# with contextvars.copy_context() so their spans nest under the request
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+# Rough characters-per-token ratio used when the backend reports no usage
+CHARS_PER_TOKEN = 4
+
+# Order of span categories in summaries; phases keep first-seen order within a category
+CATEGORY_ORDER = {"run": 0, "crew": 1, "tool": 2, "llm": 3}
+
+
+def estimate_tokens(content):
+    """Approximate the token count of a prompt (string or chat messages) or a completion."""
+    if content is None:
+        return 0
+    if isinstance(content, str):
+        return (len(content) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+    if isinstance(content, dict):
+        return estimate_tokens(content.get("content"))
+    if isinstance(content, (list, tuple)):
+        return sum(estimate_tokens(item) for item in content)
+    return estimate_tokens(str(content))
+
+
+class Span:
+    """One timed unit of work: a request, a crew kickoff, a tool call or an LLM call."""
+
+    __slots__ = ("name", "category", "parent", "run_id", "thread_id", "start", "end",
+                 "llm_calls", "prompt_tokens", "completion_tokens", "attributes")
+
+    def __init__(self, name, category, parent, run_id, attributes):
+        self.name = name
+        self.category = category
+        self.parent = parent
+        self.run_id = run_id
+        self.thread_id = threading.get_ident()
+        self.start = time.perf_counter()
+        self.end = None
+        self.llm_calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.attributes = attributes
+
+    @property
+    def duration(self):
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+    def add_usage(self, llm_calls=0, prompt_tokens=0, completion_tokens=0):
+        """Add usage to this span and every enclosing span."""
+        span = self
+        while span is not None:
+            span.llm_calls += llm_calls
+            span.prompt_tokens += prompt_tokens
+            span.completion_tokens += completion_tokens
+            span = span.parent
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "category": self.category,
+            "run_id": self.run_id,
+            "parent": self.parent.name if self.parent is not None else None,
+            "thread_id": self.thread_id,
+            "duration_seconds": round(self.duration, 6),
+            "llm_calls": self.llm_calls,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "attributes": self.attributes
+        }
+
+
+class PipelineProfiler:
+    """Records wall time, LLM calls, token counts and tool latency per pipeline phase.
+
+    Usage:
+        profiler = PipelineProfiler()
+        profiler.instrument_llm(llm)
+        with profiler.span("recommend_books", "run"):
+            with profiler.span("search", "crew") as span:
+                before = profiler.crew_usage(crew)
+                output = crew.kickoff()
+                profiler.record_crew_usage(span, output, crew, before)
+        profiler.print_summary()
+        profiler.export("profiles")  # profile.json, profile.prom, profile.trace.json
+    """
+
+    def __init__(self, max_spans=100_000):
+        # Finished spans, oldest dropped first so long batch runs stay bounded
+        self.spans = deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+        self._run_ids = itertools.count(1)
+        self._origin = time.perf_counter()
+
+    @contextmanager
+    def span(self, name, category="crew", **attributes):
+        parent = _current_span.get()
+        run_id = parent.run_id if parent is not None else next(self._run_ids)
+        span = Span(name, category, parent, run_id, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        finally:
+            span.end = time.perf_counter()
+            _current_span.reset(token)
+            with self._lock:
+                self.spans.append(span)
+
+    def instrument_llm(self, llm):
+        """Wrap llm.call so each call is timed and its tokens are charged to the open span."""
+        original_call = llm.call
+
+        def profiled_call(messages, *args, **kwargs):
+            with self.span("llm.call", "llm", model=getattr(llm, "model", None)) as span:
+                response = original_call(messages, *args, **kwargs)
+                span.add_usage(1, estimate_tokens(messages), estimate_tokens(response))
+                return response
+
+        llm.call = profiled_call
+        return llm
+
+    def crew_usage(self, crew):
+        """Snapshot the cumulative (prompt, completion) token counters of a crew's agents.
+
+        Returns None when the agents keep no counters (older crewAI versions)."""
+        agents = list(getattr(crew, "agents", None) or [])
+        if getattr(crew, "manager_agent", None) is not None:
+            agents.append(crew.manager_agent)
+        usage = {}
+        for agent in agents:
+            token_process = getattr(agent, "_token_process", None)
+            if token_process is None or not hasattr(token_process, "get_summary"):
+                return None
+            summary = token_process.get_summary()
+            usage[id(agent)] = (getattr(summary, "prompt_tokens", 0) or 0, getattr(summary, "completion_tokens", 0) or 0)
+        return usage
+
+    def record_crew_usage(self, span, crew_output, crew=None, before=None):
+        """Replace the estimated token counts of a crew span with what its agents used in this kickoff.
+
+        crewAI's token_usage sums each agent's counters over the agent's whole
+        life, so pooled agents also report the kickoffs of earlier requests.
+        Only the growth of the counters since `before` (a crew_usage snapshot)
+        is charged; without a snapshot the estimates are kept and crewAI's
+        total is recorded in the "reported_tokens" attribute."""
+        after = self.crew_usage(crew) if crew is not None and before is not None else None
+        if after is None:
+            usage = getattr(crew_output, "token_usage", None)
+            prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+            completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+            if prompt_tokens or completion_tokens:
+                span.attributes["reported_tokens"] = {"prompt": prompt_tokens, "completion": completion_tokens}
+            return
+        prompt_tokens = completion_tokens = 0
+        for agent_id, (prompt, completion) in after.items():
+            previous_prompt, previous_completion = before.get(agent_id, (0, 0))
+            prompt_tokens += prompt - previous_prompt
+            completion_tokens += completion - previous_completion
+        if not prompt_tokens and not completion_tokens:
+            return
+        span.add_usage(0, prompt_tokens - span.prompt_tokens, completion_tokens - span.completion_tokens)
+        span.attributes["usage"] = "reported"
+
+    def last_run_id(self):
+        with self._lock:
+            for span in reversed(self.spans):
+                if span.parent is None:
+                    return span.run_id
+        return None
+
+    def _finished_spans(self, run_id=None):
+        with self._lock:
+            return [span for span in self.spans if run_id is None or span.run_id == run_id]
+
+    def summary(self, run_id=None):
+        """Aggregate spans per (category, name), in order of first appearance."""
+        rows = {}
+        for span in self._finished_spans(run_id):
+            row = rows.setdefault((span.category, span.name), {
+                "category": span.category,
+                "name": span.name,
+                "count": 0,
+                "total_seconds": 0.0,
+                "max_seconds": 0.0,
+                "llm_calls": 0,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+                "timeouts": 0
+            })
+            row["count"] += 1
+            row["total_seconds"] += span.duration
+            row["max_seconds"] = max(row["max_seconds"], span.duration)
+            row["llm_calls"] += span.llm_calls
+            row["prompt_tokens"] += span.prompt_tokens
+            row["completion_tokens"] += span.completion_tokens
+            row["timeouts"] += bool(span.attributes.get("timed_out"))
+        return sorted(rows.values(), key=lambda row: CATEGORY_ORDER.get(row["category"], len(CATEGORY_ORDER)))
+
+    def format_summary(self, run_id=None):
+        rows = self.summary(run_id)
+        lines = [f"{'phase':<32} {'count':>5} {'total s':>9} {'max s':>8} {'llm':>5} {'prompt tok':>11} {'compl tok':>10} {'timeouts':>8}",
+                 "-" * 95]
+        for row in rows:
+            name = f"{row['category']}:{row['name']}"
+            lines.append(f"{name[:32]:<32} {row['count']:>5} {row['total_seconds']:>9.2f} {row['max_seconds']:>8.2f} "
+                         f"{row['llm_calls']:>5} {row['prompt_tokens']:>11} {row['completion_tokens']:>10} {row['timeouts']:>8}")
+        return "\n".join(lines)
+
+    def print_summary(self, run_id=None):
+        print("\n⏱️ Pipeline profile")
+        print(self.format_summary(run_id))
+
+    def to_json(self, run_id=None):
+        return {
+            "summary": self.summary(run_id),
+            "spans": [span.to_dict() for span in self._finished_spans(run_id)]
+        }
+
+    def to_openmetrics(self, run_id=None):
+        """Render the summary in the OpenMetrics text format."""
+        metrics = [
+            ("library_phase_duration_seconds", "counter", "Wall time spent in a pipeline phase", "total_seconds"),
+            ("library_phase_runs", "counter", "Number of times a pipeline phase ran", "count"),
+            ("library_llm_calls", "counter", "LLM calls made during a pipeline phase", "llm_calls"),
+            ("library_prompt_tokens", "counter", "Prompt tokens sent during a pipeline phase", "prompt_tokens"),
+            ("library_completion_tokens", "counter", "Completion tokens received during a pipeline phase", "completion_tokens"),
+            ("library_phase_timeouts", "counter", "Times a pipeline phase ran past its deadline", "timeouts"),
+        ]
+        rows = self.summary(run_id)
+        lines = []
+        for metric, kind, help_text, field in metrics:
+            lines.append(f"# TYPE {metric} {kind}")
+            lines.append(f"# HELP {metric} {help_text}.")
+            for row in rows:
+                name = row["name"].replace("\\", "\\\\").replace('"', '\\"')
+                lines.append(f'{metric}_total{{category="{row["category"]}",phase="{name}"}} {row[field]}')
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def to_chrome_trace(self, run_id=None):
+        """Return spans as Chrome trace events (load in chrome://tracing or Perfetto)."""
+        pid = os.getpid()
+        events = []
+        for span in self._finished_spans(run_id):
+            events.append({
+                "name": span.name,
+                "cat": span.category,
+                "ph": "X",
+                "ts": round((span.start - self._origin) * 1e6, 1),
+                "dur": round(span.duration * 1e6, 1),
+                "pid": pid,
+                "tid": span.thread_id,
+                "args": {
+                    "run_id": span.run_id,
+                    "llm_calls": span.llm_calls,
+                    "prompt_tokens": span.prompt_tokens,
+                    "completion_tokens": span.completion_tokens,
+                    **{key: str(value) for key, value in span.attributes.items()}
+                }
+            })
+        events.sort(key=lambda event: event["ts"])
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export(self, directory, run_id=None, prefix="profile"):
+        """Write JSON, OpenMetrics and Chrome trace files to a directory and return their paths."""
+        os.makedirs(directory, exist_ok=True)
+        paths = {
+            "json": os.path.join(directory, f"{prefix}.json"),
+            "openmetrics": os.path.join(directory, f"{prefix}.prom"),
+            "chrome_trace": os.path.join(directory, f"{prefix}.trace.json")
+        }
+        with open(paths["json"], "w", encoding="utf-8") as file:
+            json.dump(self.to_json(run_id), file, indent=2, default=str)
+        with open(paths["openmetrics"], "w", encoding="utf-8") as file:
+            file.write(self.to_openmetrics(run_id))
+        with open(paths["chrome_trace"], "w", encoding="utf-8") as file:
+            json.dump(self.to_chrome_trace(run_id), file)
+        return paths
+
+
+def track(profiler, name, category="tool", **attributes):
+    """profiler.span(...) when profiling is enabled, a no-op context otherwise."""
+    if profiler is None:
+        return nullcontext()
+    return profiler.span(name, category, **attributes)
@@ -0,0 +1,125 @@
+import ast
+import json
+import re
+
+# "1.", "2)", "-", "*", "•" list markers at the start of a line
+LIST_MARKER_PATTERN = re.compile(r"^\s*(?:\d+[.)]|[-*•+])\s*")
+# "Keywords:", "Title keywords -" and similar labels in front of the list
+LABEL_PATTERN = re.compile(r"^[^:]{0,40}\bkeywords?\b[^:]{0,20}[:：]\s*", re.IGNORECASE)
+# "Priority: High", "Audience: beginners" fields of the analysis, never keywords
+FIELD_PATTERN = re.compile(r"^[^:：,;]{1,30}[:：]\s*\S")
+SEPARATOR_PATTERN = re.compile(r"[,;，；、]")
+QUOTE_CHARACTERS = "\"'`“”‘’《》*_"
+
+# Longer fragments are prose, not search keywords
+MAX_KEYWORD_WORDS = 6
+
+
+def _literal_list(text):
+    """Return the first JSON/Python list of strings embedded in the text, if any."""
+    start, end = text.find("["), text.rfind("]")
+    if start == -1 or end <= start:
+        return None
+    fragment = text[start:end + 1]
+    for parse in (json.loads, ast.literal_eval):
+        try:
+            value = parse(fragment)
+        except (ValueError, SyntaxError):
+            continue
+        if isinstance(value, list) and value and all(isinstance(item, str) for item in value):
+            return value
+    return None
+
+
+def _clean(keyword):
+    keyword = LIST_MARKER_PATTERN.sub("", keyword).strip().strip(QUOTE_CHARACTERS).strip()
+    return keyword.rstrip(".").strip()
+
+
+def _items(line):
+    """Split one line of a keyword list into its comma separated keywords."""
+    return SEPARATOR_PATTERN.split(LIST_MARKER_PATTERN.sub("", line.strip()))
+
+
+def _is_heading(line):
+    # "Priority needs:" introduces a list, "Priority: High" is a field of the analysis
+    return line.endswith((":", "：")) or bool(FIELD_PATTERN.match(line))
+
+
+def _labelled_sections(lines):
+    """Keywords of every "Keywords:" section: the rest of the label line and the list under it."""
+    candidates = []
+    found = False
+    for index, line in enumerate(lines):
+        stripped = LIST_MARKER_PATTERN.sub("", line.strip())
+        label = LABEL_PATTERN.match(stripped)
+        if not label:
+            continue
+        found = True
+        candidates.extend(SEPARATOR_PATTERN.split(stripped[label.end():]))
+        listed = False
+        for following in lines[index + 1:]:
+            following = following.strip()
+            if not following:
+                if listed:
+                    break
+                continue
+            item = LIST_MARKER_PATTERN.sub("", following)
+            if LABEL_PATTERN.match(item) or (_is_heading(item) and not LIST_MARKER_PATTERN.match(following)):
+                break
+            if FIELD_PATTERN.match(item):
+                continue
+            candidates.extend(_items(following))
+            listed = True
+    return candidates if found else None
+
+
+def _bulleted_items(lines):
+    candidates = []
+    for line in lines:
+        if not LIST_MARKER_PATTERN.match(line):
+            continue
+        item = LIST_MARKER_PATTERN.sub("", line.strip())
+        if item and not _is_heading(item):
+            candidates.extend(_items(item))
+    return candidates or None
+
+
+def _free_text(lines):
+    candidates = []
+    for line in lines:
+        line = line.strip()
+        if line and not _is_heading(line):
+            candidates.extend(_items(line))
+    return candidates
+
+
+def parse_keywords(text, limit=10):
+    """Extract the search keywords from the Demand Assistant's analysis.
+
+    Accepts a JSON/Python list, the list or comma separated keywords under a
+    "Keywords:" label, or else a bulleted or numbered list. Only when the
+    analysis has none of these are its free-text lines split into keywords.
+    Headings, "Priority: High" style fields, sentences and duplicates are
+    dropped and at most `limit` keywords are returned, in the order given."""
+    if not isinstance(text, str) or not text.strip():
+        return []
+
+    lines = text.splitlines()
+    candidates = _literal_list(text)
+    for extract in (_labelled_sections, _bulleted_items, _free_text):
+        if candidates is not None:
+            break
+        candidates = extract(lines)
+
+    keywords = {}
+    for candidate in candidates:
+        keyword = _clean(candidate)
+        # "Machine learning - a field of AI" keeps only the keyword before the dash
+        keyword = re.split(r"\s+[-–—:]\s+", keyword, maxsplit=1)[0].strip(QUOTE_CHARACTERS).strip()
+        if not keyword or len(keyword.split()) > MAX_KEYWORD_WORDS:
+            continue
+        keywords.setdefault(keyword.casefold(), keyword)
+        if len(keywords) >= limit:
+            break
+    return list(keywords.values())
@@ -0,0 +1,404 @@
+import argparse
+import csv
+import os
+import sqlite3
+import threading
+
+import pandas as pd
+
+from src.utils.catalog_index import CatalogIndex, LIBRARY_COLUMNS, tokenize
+from src.utils.catalog_snapshot import CatalogSnapshot
+from src.utils.file_lock import FileLock
+from src.utils.title_index import normalize_title, title_trigrams
+from src.utils.vector_index import VectorIndex
+
+SQLITE_EXTENSIONS = (".db", ".sqlite", ".sqlite3")
+
+
+def new_book_record(number, book_data):
+    """Fill in defaults for a book about to be added to the catalog."""
+    return {
+        "Number": number,
+        "Title": book_data.get("Title", "Unknown Title"),
+        "Call Number": book_data.get("Call Number", "Unknown"),
+        "Author": book_data.get("Author", "Unknown Author"),
+        "Publication Information": book_data.get("Publication Information", "Unknown"),
+        "Content and Summary": book_data.get("Content and Summary", "No description available"),
+        "status": book_data.get("status", "available")
+    }
+
+
+def create_storage(library_path, **kwargs):
+    """Pick the storage backend from the catalog path: SQLite for .db/.sqlite files, CSV otherwise.
+
+    Keyword arguments (compact_every, vector_encoder) only apply to CSV catalogs."""
+    if library_path.endswith(SQLITE_EXTENSIONS):
+        return SqliteLibraryStorage(library_path)
+    return CsvLibraryStorage(library_path, **kwargs)
+
+
+class CsvLibraryStorage:
+    """Catalog kept in a CSV file and served from an in-memory CatalogIndex.
+
+    New books are appended in place under a file lock, with Numbers taken from
+    a sequence persisted next to the CSV."""
+
+    def __init__(self, library_path, compact_every=0, use_snapshot=True, vector_encoder=None):
+        self.library_path = library_path
+        # With pyarrow installed, cold loads come from a memory-mapped Arrow snapshot of the CSV
+        snapshot = CatalogSnapshot(library_path) if use_snapshot and CatalogSnapshot.available() else None
+        # Semantic search keeps book embeddings in a memory-mapped matrix next to the CSV
+        vectors = VectorIndex(library_path, vector_encoder) if vector_encoder is not None else None
+        self.catalog = CatalogIndex(library_path, snapshot=snapshot, vectors=vectors)
+        # Rewrite the CSV to drop repeated rows after this many appended rows (0, the default, disables)
+        self.compact_every = compact_every
+        self._appended_since_compaction = 0
+
+    def load(self):
+        # Served from the in-memory catalog; reloaded when the CSV changes
+        return self.catalog.frame()
+
+    def is_empty(self):
+        return self.catalog.frame().empty
+
+    def save(self, df):
+        with FileLock(self.library_path):
+            temp_path = f"{self.library_path}.tmp"
+            df.to_csv(temp_path, index=False)
+            os.replace(temp_path, self.library_path)
+            self.catalog.invalidate()
+
+    def search(self, query):
+        return self.catalog.search(query)
+
+    def rank(self, query, top_k=10):
+        return self.catalog.rank(query, top_k=top_k)
+
+    def search_many(self, queries):
+        return self.catalog.search_many(queries)
+
+    def get_books(self, numbers):
+        frame = self.catalog.frame()
+        return frame[frame["Number"].isin(numbers)]
+
+    def rank_many(self, queries, top_k=10):
+        return self.catalog.rank_many(queries, top_k=top_k)
+
+    def supports_semantic_search(self):
+        return self.catalog.vectors is not None
+
+    def semantic_rank_many(self, queries, top_k=10):
+        return self.catalog.semantic_rank_many(queries, top_k=top_k)
+
+    def hybrid_rank_many(self, queries, top_k=10, semantic_weight=0.5):
+        return self.catalog.hybrid_rank_many(queries, top_k=top_k, semantic_weight=semantic_weight)
+
+    def find_titles(self, title, threshold=0.7, limit=5):
+        return self.catalog.find_titles(title, threshold=threshold, limit=limit)
+
+    def title_containing(self, title):
+        return self.catalog.title_containing(title)
+
+    def _allocate_numbers(self, count):
+        """Reserve `count` consecutive book Numbers from the persisted sequence. Caller holds the lock."""
+        sequence_path = f"{self.library_path}.seq"
+        try:
+            with open(sequence_path, "r") as file:
+                next_number = int(file.read().strip())
+        except (OSError, ValueError):
+            # First allocation: continue after the highest Number in the catalog
+            numbers = pd.to_numeric(self.load()["Number"], errors="coerce")
+            next_number = int(numbers.max()) + 1 if numbers.notna().any() else 1
+
+        temp_path = f"{sequence_path}.tmp"
+        with open(temp_path, "w") as file:
+            file.write(str(next_number + count))
+        os.replace(temp_path, sequence_path)
+        return list(range(next_number, next_number + count))
+
+    def append(self, books):
+        """Append books to the end of the CSV under the library lock and return the new records."""
+        with FileLock(self.library_path):
+            previous_signature = self.catalog.file_signature()
+            records = [
+                new_book_record(number, book_data)
+                for number, book_data in zip(self._allocate_numbers(len(books)), books)
+            ]
+
+            needs_header = previous_signature is None or previous_signature[1] == 0
+            needs_newline = False
+            if not needs_header:
+                with open(self.library_path, "rb") as file:
+                    file.seek(-1, os.SEEK_END)
+                    needs_newline = file.read(1) not in (b"\n", b"\r")
+
+            with open(self.library_path, "a", newline="", encoding="utf-8") as file:
+                writer = csv.writer(file, lineterminator="\n")
+                if needs_header:
+                    writer.writerow(LIBRARY_COLUMNS)
+                elif needs_newline:
+                    file.write("\n")
+                writer.writerows([[record[column] for column in LIBRARY_COLUMNS] for record in records])
+
+            self.catalog.extend(records, previous_signature)
+            self._appended_since_compaction += len(records)
+            if self.compact_every and self._appended_since_compaction >= self.compact_every:
+                self.compact()
+        return records
+
+    def compact(self):
+        """Rewrite the CSV without rows that repeat an earlier row field for field. Returns rows removed.
+
+        Copies and editions of a book have their own Number and status, so
+        they are different rows and are kept."""
+        with FileLock(self.library_path):
+            try:
+                # Raw strings, so only identical text counts as a repeat
+                library = pd.read_csv(self.library_path, dtype=str, keep_default_na=False)
+            except Exception as e:
+                print(f"Error compacting library: {e}")
+                return 0
+            duplicates = library.duplicated()
+            if duplicates.any():
+                self.save(library[~duplicates])
+            self._appended_since_compaction = 0
+            return int(duplicates.sum())
+
+
+class SqliteLibraryStorage:
+    """Catalog kept in SQLite with an FTS5 index over title, author and summary.
+
+    The database runs in WAL mode so readers never block on a writer, and each
+    thread uses its own connection. Titles are also stored normalized with a
+    B-tree index for exact lookups."""
+
+    # Catalog column -> SQLite column
+    COLUMNS = {
+        "Number": "number",
+        "Title": "title",
+        "Call Number": "call_number",
+        "Author": "author",
+        "Publication Information": "publication_information",
+        "Content and Summary": "content_and_summary",
+        "status": "status"
+    }
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS books (
+            number INTEGER PRIMARY KEY,
+            title TEXT,
+            call_number TEXT,
+            author TEXT,
+            publication_information TEXT,
+            content_and_summary TEXT,
+            status TEXT,
+            title_key TEXT
+        );
+        CREATE INDEX IF NOT EXISTS books_title_key ON books (title_key);
+        CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5(
+            title, author, content_and_summary,
+            content='books', content_rowid='number',
+            tokenize='unicode61 remove_diacritics 2'
+        );
+        CREATE TRIGGER IF NOT EXISTS books_after_insert AFTER INSERT ON books BEGIN
+            INSERT INTO books_fts (rowid, title, author, content_and_summary)
+            VALUES (new.number, new.title, new.author, new.content_and_summary);
+        END;
+        CREATE TRIGGER IF NOT EXISTS books_after_delete AFTER DELETE ON books BEGIN
+            INSERT INTO books_fts (books_fts, rowid, title, author, content_and_summary)
+            VALUES ('delete', old.number, old.title, old.author, old.content_and_summary);
+        END;
+        CREATE TRIGGER IF NOT EXISTS books_after_update AFTER UPDATE ON books BEGIN
+            INSERT INTO books_fts (books_fts, rowid, title, author, content_and_summary)
+            VALUES ('delete', old.number, old.title, old.author, old.content_and_summary);
+            INSERT INTO books_fts (rowid, title, author, content_and_summary)
+            VALUES (new.number, new.title, new.author, new.content_and_summary);
+        END;
+    """
+
+    def __init__(self, library_path):
+        self.library_path = library_path
+        self._local = threading.local()
+        directory = os.path.dirname(library_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection().executescript(self.SCHEMA)
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.library_path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def _select(self, extra_columns=""):
+        columns = ", ".join(f'b.{column} AS "{name}"' for name, column in self.COLUMNS.items())
+        return f"SELECT {columns}{extra_columns} FROM books b"
+
+    def _query(self, sql, params=()):
+        return pd.read_sql_query(sql, self._connection(), params=params)
+
+    @staticmethod
+    def _match_expression(query, operator=" "):
+        # Quote every token so FTS5 operators in user text are matched literally
+        return operator.join(f'"{token}"' for token in dict.fromkeys(tokenize(query)))
+
+    def _insert(self, connection, records):
+        connection.executemany(
+            f"INSERT INTO books ({', '.join(self.COLUMNS.values())}, title_key) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [
+                [record[name] for name in self.COLUMNS] + [normalize_title(record["Title"])]
+                for record in records
+            ]
+        )
+
+    def load(self):
+        return self._query(f"{self._select()} ORDER BY b.number")
+
+    def is_empty(self):
+        return self._connection().execute("SELECT 1 FROM books LIMIT 1").fetchone() is None
+
+    def save(self, df):
+        records = df.astype(object).where(df.notna(), None).to_dict("records")
+        connection = self._connection()
+        with connection:
+            connection.execute("DELETE FROM books")
+            self._insert(connection, records)
+
+    def search(self, query):
+        expression = self._match_expression(query)
+        if not expression:
+            return self._query(f"{self._select()} WHERE 0")
+        return self._query(
+            f"{self._select()} JOIN books_fts ON books_fts.rowid = b.number "
+            f"WHERE books_fts MATCH ? ORDER BY b.number",
+            (expression,)
+        )
+
+    def rank(self, query, top_k=10):
+        expression = self._match_expression(query, operator=" OR ")
+        if not expression or top_k <= 0:
+            return self._query(f"{self._select()} WHERE 0"), []
+        results = self._query(
+            f"{self._select(', -bm25(books_fts) AS score')} JOIN books_fts ON books_fts.rowid = b.number "
+            f"WHERE books_fts MATCH ? ORDER BY bm25(books_fts) LIMIT ?",
+            (expression, top_k)
+        )
+        scores = results.pop("score").to_numpy()
+        return results, scores
+
+    def get_books(self, numbers):
+        placeholders = ", ".join("?" for _ in numbers)
+        return self._query(f"{self._select()} WHERE b.number IN ({placeholders}) ORDER BY b.number", tuple(numbers))
+
+    def _read_snapshot(self, queries, run):
+        # One read transaction, so every query sees the same version of the catalog
+        connection = self._connection()
+        connection.execute("BEGIN")
+        try:
+            return [run(query) for query in queries]
+        finally:
+            connection.execute("COMMIT")
+
+    def search_many(self, queries):
+        return self._read_snapshot(queries, self.search)
+
+    def rank_many(self, queries, top_k=10):
+        return self._read_snapshot(queries, lambda query: self.rank(query, top_k=top_k))
+
+    def supports_semantic_search(self):
+        # Embeddings are only kept for CSV catalogs; LibraryTools falls back to BM25 ranking
+        return False
+
+    def title_containing(self, title):
+        normalized = normalize_title(title)
+        if not normalized:
+            return None
+        # Titles holding every word of the query, checked for the words in sequence
+        candidates = self._connection().execute(
+            "SELECT b.title, b.title_key FROM books_fts JOIN books b ON b.number = books_fts.rowid "
+            "WHERE books_fts MATCH ? ORDER BY b.number",
+            (f"title : ({self._match_expression(normalized)})",)
+        )
+        for candidate_title, candidate_key in candidates:
+            if f" {normalized} " in f" {candidate_key or ''} ":
+                return candidate_title
+        return None
+
+    def find_titles(self, title, threshold=0.7, limit=5):
+        normalized = normalize_title(title)
+        if not normalized:
+            return []
+        connection = self._connection()
+        exact = connection.execute(
+            "SELECT title FROM books WHERE title_key = ? LIMIT 1", (normalized,)
+        ).fetchone()
+        if exact and limit == 1:
+            return [(exact[0], 1.0)]
+
+        # Candidates share at least one word with the title; score them on trigrams
+        expression = self._match_expression(normalized, operator=" OR ")
+        candidates = connection.execute(
+            "SELECT b.title, b.title_key FROM books_fts JOIN books b ON b.number = books_fts.rowid "
+            "WHERE books_fts MATCH ? ORDER BY bm25(books_fts) LIMIT ?",
+            (f"title : ({expression})", limit * 10)
+        ).fetchall()
+        grams = title_trigrams(normalized)
+        scored = {}
+        for candidate_title, candidate_key in candidates:
+            candidate_grams = title_trigrams(candidate_key or "")
+            score = len(grams & candidate_grams) / len(grams | candidate_grams)
+            if score >= threshold:
+                scored[candidate_title] = max(score, scored.get(candidate_title, 0.0))
+        if exact:
+            scored[exact[0]] = 1.0
+        return sorted(scored.items(), key=lambda item: -item[1])[:limit]
+
+    def append(self, books):
+        connection = self._connection()
+        with connection:
+            # BEGIN IMMEDIATE takes the write lock up front, so the Numbers
+            # allocated here cannot be handed out to a concurrent writer
+            connection.execute("BEGIN IMMEDIATE")
+            next_number = connection.execute("SELECT COALESCE(MAX(number), 0) + 1 FROM books").fetchone()[0]
+            records = [new_book_record(next_number + i, book_data) for i, book_data in enumerate(books)]
+            self._insert(connection, records)
+        return records
+
+    def compact(self):
+        """Merge the FTS index segments. Returns 0: Number is the primary key, so no row can repeat another."""
+        connection = self._connection()
+        with connection:
+            connection.execute("INSERT INTO books_fts (books_fts) VALUES ('optimize')")
+        return 0
+
+    def import_csv(self, csv_path, chunksize=50_000):
+        """One-shot import of an existing CSV catalog. Returns the number of rows imported."""
+        connection = self._connection()
+        imported = 0
+        with connection:
+            for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+                chunk = chunk.reindex(columns=LIBRARY_COLUMNS)
+                # Rows without a usable Number get the next free one from SQLite
+                chunk["Number"] = pd.to_numeric(chunk["Number"], errors="coerce").astype("Int64")
+                chunk = chunk.astype(object).where(chunk.notna(), None)
+                self._insert(connection, chunk.to_dict("records"))
+                imported += len(chunk)
+        return imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import a CSV library catalog into a SQLite database.")
+    parser.add_argument("csv_path", help="Existing CSV catalog, e.g. data/lite_library.csv")
+    parser.add_argument("db_path", help="SQLite database to create or extend, e.g. data/library.db")
+    args = parser.parse_args()
+
+    storage = SqliteLibraryStorage(args.db_path)
+    imported = storage.import_csv(args.csv_path)
+    print(f"Imported {imported} books into {args.db_path}")
+
+
+if __name__ == "__main__":
+    main()
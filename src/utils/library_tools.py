@@ -1,94 +1,288 @@
-import pandas as pd
+import json
+import re
+import threading
+
 from langchain.tools import tool
 
+from src.utils.library_storage import create_storage
+from src.utils.instrumentation import track, estimate_tokens
+from src.utils.result_format import COMPACT_FIELDS, books_to_tsv
+from src.utils.vector_index import DEFAULT_ENCODER, create_encoder
+
+# Search modes that return only the top_k best-scored rows
+RANKED_MODES = ("ranked", "semantic", "hybrid")
+
+
+def parse_queries(queries):
+    """Turn the queries an agent passed into a list of distinct, non-empty strings.
+
+    Agents send a list, a JSON list in a string, or plain comma/newline
+    separated text."""
+    if isinstance(queries, str):
+        try:
+            queries = json.loads(queries)
+        except ValueError:
+            queries = re.split(r"[,\n]", queries)
+        if not isinstance(queries, list):
+            queries = [queries]
+    elif not isinstance(queries, (list, tuple, set)):
+        queries = [queries]
+    queries = [str(query).strip() for query in queries if query is not None]
+    return list(dict.fromkeys(query for query in queries if query))
+
 class LibraryTools:
-    def __init__(self, library_path="data/lite_library.csv"):
+    def __init__(self, library_path="data/lite_library.csv", search_mode="match", top_k=10,
+                 title_match_threshold=0.7, compact_every=0, result_format="full",
+                 compact_fields=None, summary_chars=160, embedding_model=DEFAULT_ENCODER, semantic_weight=0.5):
         self.library_path = library_path
+        # CSV catalogs are served from an in-memory index, .db/.sqlite catalogs from SQLite FTS5
+        vector_encoder = create_encoder(embedding_model) if search_mode in ("semantic", "hybrid") else None
+        self.storage = create_storage(library_path, compact_every=compact_every, vector_encoder=vector_encoder)
+        if vector_encoder is not None and not self.storage.supports_semantic_search():
+            print(f"⚠️ Semantic search needs a CSV catalog, ranking {library_path} with BM25 instead")
+            search_mode = "ranked"
+        # "match" returns every row containing the query terms,
+        # "ranked" returns only the top_k BM25-scored rows,
+        # "semantic" the top_k rows nearest to the query by embedding cosine similarity,
+        # "hybrid" the top_k by a semantic_weight blend of cosine and normalized BM25 scores
+        self.search_mode = search_mode
+        self.semantic_weight = semantic_weight
+        self.top_k = top_k
+        # Minimum trigram similarity for check_book_exists to treat two titles as the same book
+        self.title_match_threshold = title_match_threshold
+        # Optional PipelineProfiler timing each tool call
+        self.profiler = None
+        # "full" returns every column as a list of dicts, "compact" a TSV table of
+        # compact_fields with summaries cut to summary_chars (see get_book_details)
+        self.result_format = result_format
+        self.compact_fields = compact_fields or COMPACT_FIELDS
+        self.summary_chars = summary_chars
+        # Accounting hook called as on_result(tool_name, full_tokens, sent_tokens)
+        self.on_result = None
+        self._result_tokens = {"calls": 0, "full_tokens": 0, "sent_tokens": 0}
+        self._result_tokens_lock = threading.Lock()
     
     def _load_library(self):
-        try:
-            return pd.read_csv(self.library_path)
-        except Exception as e:
-            print(f"Error loading library: {str(e)}")
-            return pd.DataFrame(columns=["Number", "Title", "Call Number", "Author", 
-                                        "Publication Information", "Content and Summary", "status"])
+        return self.storage.load()
     
     def _save_library(self, df):
-        df.to_csv(self.library_path, index=False)
+        self.storage.save(df)
+    
+    @staticmethod
+    def _format_books(results, scores=None):
+        output = []
+        for position, (_, row) in enumerate(results.iterrows()):
+            book = {
+                "Number": row['Number'],
+                "Title": row['Title'],
+                "Call Number": row['Call Number'],
+                "Author": row['Author'],
+                "Publication Information": row['Publication Information'],
+                "Content and Summary": row['Content and Summary'],
+                "Status": row['status']
+            }
+            if scores is not None:
+                book["Score"] = round(float(scores[position]), 4)
+            output.append(book)
+        return output
+    
+    def encode_books(self, tool_name, books, as_text=False):
+        """Return books in the configured result format and account for the tokens it saves.
+        
+        "full" results stay a list of dicts unless as_text is set, in which case they are
+        JSON encoded; "compact" results are always a TSV table."""
+        if self.result_format == "compact":
+            encoded = books_to_tsv(books, self.compact_fields, self.summary_chars)
+        elif as_text:
+            encoded = json.dumps(books, ensure_ascii=False, default=str)
+        else:
+            encoded = books
+        self._account(tool_name, books, encoded)
+        return encoded
+    
+    def _account(self, tool_name, books, encoded):
+        # What the agent would have been sent in the full format vs what it gets
+        full_tokens = estimate_tokens(str(books))
+        sent_tokens = estimate_tokens(encoded if isinstance(encoded, str) else str(encoded))
+        with self._result_tokens_lock:
+            self._result_tokens["calls"] += 1
+            self._result_tokens["full_tokens"] += full_tokens
+            self._result_tokens["sent_tokens"] += sent_tokens
+        if self.on_result is not None:
+            try:
+                self.on_result(tool_name, full_tokens, sent_tokens)
+            except Exception as e:
+                print(f"Error in result accounting hook: {e}")
+    
+    def result_stats(self):
+        """Estimated tokens of every tool result so far, in the full and the configured format."""
+        with self._result_tokens_lock:
+            stats = dict(self._result_tokens)
+        stats["saved_tokens"] = stats["full_tokens"] - stats["sent_tokens"]
+        return stats
+    
+    def _merge_hits(self, queries, hits):
+        """Combine per-query (rows, scores) hits into per-query Number lists and one
+        deduplicated book list. A book keeps the best score any query gave it and the
+        queries that found it; ranked results are ordered by that score."""
+        per_query, merged = {}, {}
+        for query, (results, scores) in zip(queries, hits):
+            books = self._format_books(results, scores)
+            per_query[query] = [book["Number"] for book in books]
+            for book in books:
+                entry = merged.get(book["Number"])
+                if entry is None:
+                    book["Matched Queries"] = [query]
+                    merged[book["Number"]] = book
+                else:
+                    entry["Matched Queries"].append(query)
+                    if "Score" in book:
+                        entry["Score"] = max(entry["Score"], book["Score"])
+        books = list(merged.values())
+        if any("Score" in book for book in books):
+            books.sort(key=lambda book: -book["Score"])
+        return per_query, books
+    
+    def rank_many(self, queries, top_k=None):
+        """Return the top_k (rows, scores) of each query, ranked the way the search mode ranks.
+        
+        Match mode has no scores of its own and ranks with BM25."""
+        top_k = top_k or self.top_k
+        if self.search_mode == "semantic":
+            return self.storage.semantic_rank_many(queries, top_k=top_k)
+        if self.search_mode == "hybrid":
+            return self.storage.hybrid_rank_many(queries, top_k=top_k, semantic_weight=self.semantic_weight)
+        return self.storage.rank_many(queries, top_k=top_k)
+    
+    def search_keywords(self, keywords, per_keyword=None, known_hits=None):
+        """Rank the catalog for each keyword in one batched pass and merge the hits.
+        
+        Used by the fast retrieval path, which runs the Demand Assistant's keywords
+        directly instead of through the Retrieval Specialist. `known_hits` maps
+        queries that were already ranked (e.g. a prefetched topic) to their
+        (rows, scores); they are merged in without being searched again."""
+        known_hits = dict(known_hits or {})
+        keywords = [keyword for keyword in keywords if keyword not in known_hits]
+        hits = self.rank_many(keywords, top_k=per_keyword) if keywords else []
+        return self._merge_hits(list(known_hits) + keywords, list(known_hits.values()) + hits)[1]
+    
+    def compact_library(self):
+        """Drop catalog rows that repeat an earlier row exactly; returns the number of rows removed."""
+        return self.storage.compact()
     
     @tool("Search in library database")
     def search_library(self, query):
         """Search for books in the library database based on the query."""
-        try:
-            library = self._load_library()
-            
-            if library.empty:
-                return "The library database is empty or could not be loaded."
-            
-            # Search in title, author, and content summary
-            results = library[
-                library['Title'].str.contains(query, case=False, na=False) |
-                library['Author'].str.contains(query, case=False, na=False) |
-                library['Content and Summary'].str.contains(query, case=False, na=False)
-            ]
-            
-            if results.empty:
-                return f"No books found in the library for query: {query}"
-            
-            output = []
-            for _, row in results.iterrows():
-                output.append({
-                    "Number": row['Number'],
-                    "Title": row['Title'],
-                    "Call Number": row['Call Number'],
-                    "Author": row['Author'],
-                    "Publication Information": row['Publication Information'],
-                    "Content and Summary": row['Content and Summary'],
-                    "Status": row['status']
-                })
-            
-            return output
-        except Exception as e:
-            print(f"Error searching library: {e}")
-            return f"Error searching library: {str(e)}"
+        with track(self.profiler, "search_library"):
+            try:
+                if self.storage.is_empty():
+                    return "The library database is empty or could not be loaded."
+                
+                # Look up title, author, and content summary tokens in the catalog index
+                if self.search_mode in RANKED_MODES:
+                    results, scores = self.rank_many([query])[0]
+                else:
+                    results, scores = self.storage.search(query), None
+                
+                if results.empty:
+                    return f"No books found in the library for query: {query}"
+                
+                return self.encode_books("search_library", self._format_books(results, scores))
+            except Exception as e:
+                print(f"Error searching library: {e}")
+                return f"Error searching library: {str(e)}"
+        
+    @tool("Search in library database for several queries")
+    def search_library_batch(self, queries):
+        """Search the library database for a list of queries at once. Returns the
+        Numbers of the books each query found and one merged list of those books."""
+        queries = parse_queries(queries)
+        with track(self.profiler, "search_library_batch", queries=len(queries)):
+            try:
+                if not queries:
+                    return "No search queries given."
+                if self.storage.is_empty():
+                    return "The library database is empty or could not be loaded."
+                
+                # All queries are resolved in one pass over the catalog index
+                if self.search_mode in RANKED_MODES:
+                    hits = self.rank_many(queries)
+                else:
+                    hits = [(results, None) for results in self.storage.search_many(queries)]
+                
+                per_query, books = self._merge_hits(queries, hits)
+                if not books:
+                    return f"No books found in the library for queries: {', '.join(queries)}"
+                if self.result_format == "compact":
+                    hits_table = "\n".join(
+                        f"{query}\t{', '.join(str(number) for number in numbers)}" for query, numbers in per_query.items()
+                    )
+                    return f"query\tNumbers\n{hits_table}\n\n{self.encode_books('search_library_batch', books)}"
+                return {"results": per_query, "books": self.encode_books("search_library_batch", books)}
+            except Exception as e:
+                print(f"Error searching library: {e}")
+                return f"Error searching library: {str(e)}"
+    
+    @tool("Get book details by Number")
+    def get_book_details(self, numbers):
+        """Get the complete catalog records (full summary, call number, publication
+        information) for one or more book Numbers taken from search results."""
+        with track(self.profiler, "get_book_details"):
+            try:
+                if isinstance(numbers, str):
+                    numbers = re.findall(r"\d+", numbers)
+                elif not isinstance(numbers, (list, tuple, set)):
+                    numbers = [numbers]
+                numbers = [int(number) for number in numbers]
+                if not numbers:
+                    return "No book Numbers given."
+                
+                books = self._format_books(self.storage.get_books(numbers))
+                if not books:
+                    return f"No books found in the library with Numbers: {', '.join(map(str, numbers))}"
+                return books
+            except Exception as e:
+                print(f"Error getting book details: {e}")
+                return f"Error getting book details: {str(e)}"
     
     @tool("Check if book exists in library")
     def check_book_exists(self, title):
         """Check if a book with the given title exists in the library."""
-        try:
-            library = self._load_library()
-            
-            if library.empty:
+        with track(self.profiler, "check_book_exists"):
+            try:
+                if self.storage.is_empty():
+                    return False
+                
+                # Indexed lookups instead of a substring scan over every row: a partial
+                # title ("Gatsby") matches as a normalized substring, a misspelt one fuzzily
+                if self.storage.title_containing(title) is not None:
+                    return True
+                matches = self.storage.find_titles(title, threshold=self.title_match_threshold, limit=1)
+                return bool(matches)
+            except Exception as e:
+                print(f"Error checking if book exists: {e}")
                 return False
-            
-            exists = library['Title'].str.contains(title, case=False, na=False).any()
-            return exists
-        except Exception as e:
-            print(f"Error checking if book exists: {e}")
-            return False
-    
+        
     @tool("Add book to library")
     def add_to_library(self, book_data):
         """Add a new book to the library database."""
-        try:
-            library = self._load_library()
-            
-            new_number = int(library['Number'].max() + 1) if not library.empty else 1
-            
-            new_book = {
-                "Number": new_number,
-                "Title": book_data.get("Title", "Unknown Title"),
-                "Call Number": book_data.get("Call Number", "Unknown"),
-                "Author": book_data.get("Author", "Unknown Author"),
-                "Publication Information": book_data.get("Publication Information", "Unknown"),
-                "Content and Summary": book_data.get("Content and Summary", "No description available"),
-                "status": book_data.get("status", "available")
-            }
-            
-            library = pd.concat([library, pd.DataFrame([new_book])], ignore_index=True)
-            self._save_library(library)
-            
-            return f"Added book '{new_book['Title']}' to library with Number {new_number}"
-        except Exception as e:
-            print(f"Error adding book to library: {e}")
-            return f"Error adding book to library: {str(e)}"
\ No newline at end of file
+        with track(self.profiler, "add_to_library"):
+            try:
+                new_book = self.storage.append([book_data])[0]
+                return f"Added book '{new_book['Title']}' to library with Number {new_book['Number']}"
+            except Exception as e:
+                print(f"Error adding book to library: {e}")
+                return f"Error adding book to library: {str(e)}"
+        
+    @tool("Add several books to library")
+    def add_books_to_library(self, books):
+        """Add a list of new books to the library database in one write."""
+        with track(self.profiler, "add_books_to_library"):
+            try:
+                new_books = self.storage.append(list(books))
+                added = ", ".join(f"'{book['Title']}' (Number {book['Number']})" for book in new_books)
+                return f"Added {len(new_books)} books to library: {added}"
+            except Exception as e:
+                print(f"Error adding books to library: {e}")
+                return f"Error adding books to library: {str(e)}"
+
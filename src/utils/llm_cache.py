@@ -0,0 +1,150 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class LLMResponseCache:
+    """Persistent, content-addressed cache of LLM responses backed by SQLite.
+
+    Entries are keyed on a hash of the model name and the full message list
+    sent to the model. crewAI renders the agent's role, goal and backstory
+    into the system message and the task description and context into the
+    user message, so identical agent/task combinations share one entry.
+    Entries expire after ``ttl_seconds`` and the least recently used ones are
+    evicted once the stored responses exceed ``max_bytes``."""
+
+    def __init__(self, path="data/llm_cache.sqlite", ttl_seconds=7 * 24 * 3600, max_bytes=256 * 1024 * 1024):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL
+            )
+        """)
+        self._connection.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self._connection.commit()
+
+    @staticmethod
+    def make_key(model, messages, **params):
+        """Hash the model name, messages and any call parameters into a cache key."""
+        payload = json.dumps(
+            {"model": model, "messages": messages, "params": params},
+            sort_keys=True, ensure_ascii=False, default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT response, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            response, created = row
+            if self.ttl_seconds is not None and now - created > self.ttl_seconds:
+                self._connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._connection.commit()
+                self.misses += 1
+                return None
+            self._connection.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self._connection.commit()
+            self.hits += 1
+            return response
+
+    def put(self, key, response):
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, response, size, now, now)
+            )
+            self._evict()
+            self._connection.commit()
+
+    def _evict(self):
+        if self.ttl_seconds is not None:
+            self._connection.execute(
+                "DELETE FROM responses WHERE created < ?", (time.time() - self.ttl_seconds,)
+            )
+        if self.max_bytes is None:
+            return
+        total = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Drop the least recently used entries until the cache fits again
+        excess = total - self.max_bytes
+        stale = []
+        for key, size in self._connection.execute("SELECT key, size FROM responses ORDER BY accessed"):
+            stale.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        self._connection.executemany("DELETE FROM responses WHERE key = ?", stale)
+
+    def clear(self):
+        with self._lock:
+            self._connection.execute("DELETE FROM responses")
+            self._connection.commit()
+
+    def stats(self):
+        with self._lock:
+            entries, size = self._connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": entries,
+            "bytes": size
+        }
+
+    def wrap(self, llm):
+        """Route llm.call through the cache so every agent sharing this LLM benefits."""
+        original_call = llm.call
+
+        def cached_call(messages, *args, **kwargs):
+            # With native function calling the tools run inside the call itself,
+            # so replaying a cached answer would skip their side effects
+            if kwargs.get("available_functions"):
+                return original_call(messages, *args, **kwargs)
+
+            key = self.make_key(
+                getattr(llm, "model", None),
+                messages,
+                tools=kwargs.get("tools", args[0] if args else None),
+                temperature=getattr(llm, "temperature", None),
+                stop=getattr(llm, "stop", None)
+            )
+            cached = self.get(key)
+            if cached is not None:
+                return cached
+
+            response = original_call(messages, *args, **kwargs)
+            if isinstance(response, str) and response:
+                self.put(key, response)
+            return response
+
+        llm.call = cached_call
+        return llm
@@ -0,0 +1,238 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+# Responses worth retrying: rate limiting, overload and gateway errors
+RETRY_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+class LLMTransportError(Exception):
+    pass
+
+
+def is_usage_callback(callback):
+    """True for crewAI's TokenCalcHandler, which agents attach to every call to count tokens."""
+    return hasattr(callback, "token_cost_process") and hasattr(callback, "log_success_event")
+
+
+def _usage_object(usage):
+    # TokenCalcHandler reads usage.prompt_tokens, usage.prompt_tokens_details.cached_tokens, ...
+    if not isinstance(usage, dict):
+        return None
+    return SimpleNamespace(**{
+        name: SimpleNamespace(**value) if isinstance(value, dict) else value for name, value in usage.items()
+    })
+
+
+class AsyncLLMTransport:
+    """Shared async HTTP transport for OpenAI-compatible chat completion APIs.
+
+    Ollama serves the same API under http://localhost:11434/v1, so one client
+    covers both backends. All calls, from any thread, run on one background
+    event loop and share a keep-alive connection pool. At most `max_in_flight`
+    requests are outstanding at once, failed requests are retried with
+    jittered exponential backoff, and identical requests that are in flight
+    at the same time are sent once and share the response.
+
+    Usage:
+        transport = AsyncLLMTransport.for_model("ollama/llama3")
+        transport.install(llm)            # agents' blocking llm.call goes through the pool
+        text = await transport.acomplete("llama3", messages)
+    """
+
+    def __init__(self, base_url, api_key=None, max_connections=16, max_in_flight=8,
+                 max_retries=3, backoff_seconds=0.5, max_backoff_seconds=20.0, timeout_seconds=300.0):
+        if httpx is None:
+            raise ImportError("AsyncLLMTransport requires httpx (pip install httpx)")
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.max_connections = max_connections
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.timeout_seconds = timeout_seconds
+        self.stats = {"requests": 0, "coalesced": 0, "retries": 0, "failures": 0}
+
+        self._loop = None
+        self._client = None
+        self._semaphore = None
+        self._in_flight = {}
+        self._start_lock = threading.Lock()
+
+    @classmethod
+    def for_model(cls, model_name, base_url=None, **kwargs):
+        """Build a transport for a LibrarySystem model name ("ollama/llama3", "gpt-4", ...)."""
+        if model_name.startswith("ollama/"):
+            base_url = base_url or os.getenv("OLLAMA_BASE_URL", "http://localhost:11434").rstrip("/") + "/v1"
+            return cls(base_url, **kwargs)
+        base_url = base_url or os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+        return cls(base_url, api_key=kwargs.pop("api_key", None) or os.getenv("OPENAI_API_KEY"), **kwargs)
+
+    @staticmethod
+    def api_model_name(model_name):
+        # LiteLLM-style provider prefixes are not part of the model name the server knows
+        return model_name.split("/", 1)[1] if model_name.startswith("ollama/") else model_name
+
+    def _ensure_started(self):
+        if self._loop is not None:
+            return
+        with self._start_lock:
+            if self._loop is not None:
+                return
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def run():
+                asyncio.set_event_loop(loop)
+                headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else {}
+                self._client = httpx.AsyncClient(
+                    base_url=self.base_url,
+                    headers=headers,
+                    timeout=httpx.Timeout(self.timeout_seconds, connect=10.0),
+                    limits=httpx.Limits(
+                        max_connections=self.max_connections,
+                        max_keepalive_connections=self.max_connections
+                    )
+                )
+                self._semaphore = asyncio.Semaphore(self.max_in_flight)
+                ready.set()
+                loop.run_forever()
+
+            threading.Thread(target=run, name="llm-transport", daemon=True).start()
+            ready.wait()
+            self._loop = loop
+
+    @staticmethod
+    def _request_key(payload):
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def _backoff(self, attempt, retry_after=None):
+        if retry_after is not None:
+            try:
+                return min(float(retry_after), self.max_backoff_seconds)
+            except ValueError:
+                pass
+        # Full jitter: spreads retries of concurrent callers instead of synchronizing them
+        return random.uniform(0, min(self.max_backoff_seconds, self.backoff_seconds * 2 ** attempt))
+
+    async def _post(self, payload):
+        async with self._semaphore:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    response = await self._client.post("/chat/completions", json=payload)
+                except httpx.TransportError as e:
+                    if attempt == self.max_retries:
+                        raise LLMTransportError(f"LLM request failed: {e}") from e
+                    delay = self._backoff(attempt)
+                else:
+                    if response.status_code < 400:
+                        return response.json()
+                    if response.status_code not in RETRY_STATUS_CODES or attempt == self.max_retries:
+                        raise LLMTransportError(f"LLM request failed with HTTP {response.status_code}: {response.text[:500]}")
+                    delay = self._backoff(attempt, response.headers.get("Retry-After"))
+                self.stats["retries"] += 1
+                await asyncio.sleep(delay)
+
+    async def _send(self, payload):
+        # Runs on the transport loop, so the in-flight table needs no lock
+        key = self._request_key(payload)
+        future = self._in_flight.get(key)
+        if future is not None:
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        self.stats["requests"] += 1
+        try:
+            result = await self._post(payload)
+            future.set_result(result)
+            return result
+        except Exception as e:
+            self.stats["failures"] += 1
+            future.set_exception(e)
+            # Mark the exception as retrieved when nobody else was waiting for it
+            future.exception()
+            raise
+        finally:
+            del self._in_flight[key]
+
+    @staticmethod
+    def build_payload(model, messages, **params):
+        if isinstance(messages, str):
+            messages = [{"role": "user", "content": messages}]
+        payload = {"model": model, "messages": messages}
+        payload.update({name: value for name, value in params.items() if value is not None})
+        return payload
+
+    async def acomplete(self, model, messages, **params):
+        """Return the assistant text for a chat completion (temperature, stop, max_tokens, ...)."""
+        payload = self.build_payload(model, messages, **params)
+        self._ensure_started()
+        if asyncio.get_running_loop() is self._loop:
+            response = await self._send(payload)
+        else:
+            response = await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self._send(payload), self._loop))
+        return response["choices"][0]["message"]["content"] or ""
+
+    def complete(self, model, messages, **params):
+        """Blocking version of acomplete for crewAI's synchronous llm.call."""
+        return self.complete_response(model, messages, **params)["choices"][0]["message"]["content"] or ""
+
+    def complete_response(self, model, messages, **params):
+        """Like complete, but return the whole response body, including its "usage"."""
+        payload = self.build_payload(model, messages, **params)
+        self._ensure_started()
+        return asyncio.run_coroutine_threadsafe(self._send(payload), self._loop).result()
+
+    def install(self, llm):
+        """Send llm.call through this transport.
+
+        Calls with native tool calling, streaming or callbacks keep the original
+        path, since the transport returns one complete answer and emits no events.
+        The token counter crewAI agents attach to every call is the exception: it
+        stays on the transport and is fed the usage the server reports."""
+        original_call = llm.call
+        model = self.api_model_name(getattr(llm, "model", ""))
+
+        def transport_call(messages, *args, **kwargs):
+            callbacks = kwargs.get("callbacks") or []
+            # Tool schemas, function execution, stream chunks and other callbacks are handled by the LLM class itself
+            if (args or kwargs.get("tools") or kwargs.get("available_functions") or getattr(llm, "stream", False)
+                    or not all(is_usage_callback(callback) for callback in callbacks)):
+                return original_call(messages, *args, **kwargs)
+            start = time.time()
+            response = self.complete_response(
+                model,
+                messages,
+                temperature=getattr(llm, "temperature", None),
+                max_tokens=getattr(llm, "max_tokens", None),
+                stop=getattr(llm, "stop", None) or None
+            )
+            usage = _usage_object(response.get("usage"))
+            if usage is not None:
+                for callback in callbacks:
+                    callback.log_success_event({"model": model}, {"usage": usage}, start, time.time())
+            return response["choices"][0]["message"]["content"] or ""
+
+        llm.call = transport_call
+        return llm
+
+    def close(self):
+        """Close the connection pool and stop the background loop."""
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._client.aclose(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop = None
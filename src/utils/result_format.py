@@ -0,0 +1,45 @@
+import pandas as pd
+
+# Fields kept in compact results; the full record is one get_book_details call away
+COMPACT_FIELDS = ["Number", "Title", "Author", "Status", "Content and Summary"]
+# Added after the selected fields when present, so the column order never depends on the hits
+EXTRA_FIELDS = ["Score", "Matched Queries"]
+
+
+def truncate(text, max_chars):
+    """Cut text to at most max_chars characters on a word boundary, marking the cut with '…'."""
+    if max_chars is None or len(text) <= max_chars:
+        return text
+    if max_chars <= 0:
+        return ""
+    cut = text[:max_chars - 1]
+    if " " in cut:
+        cut = cut[:cut.rindex(" ")]
+    return cut.rstrip(" ,.;:") + "…"
+
+
+def _cell(value, max_chars=None):
+    if isinstance(value, (list, tuple)):
+        value = "; ".join(str(item) for item in value)
+    elif value is None or pd.isna(value):
+        return ""
+    # Tabs and line breaks would break the row structure
+    text = " ".join(str(value).split())
+    return truncate(text, max_chars)
+
+
+def books_to_tsv(books, fields=None, summary_chars=160):
+    """Encode book dicts as a tab separated table with a header row.
+
+    Only `fields` are kept (plus Score / Matched Queries when the books carry
+    them), "Content and Summary" is cut to `summary_chars` characters, and
+    whitespace inside values is collapsed so each book is exactly one line."""
+    fields = list(fields or COMPACT_FIELDS)
+    fields += [field for field in EXTRA_FIELDS if field not in fields and any(field in book for book in books)]
+    lines = ["\t".join(fields)]
+    for book in books:
+        lines.append("\t".join(
+            _cell(book.get(field), summary_chars if field == "Content and Summary" else None)
+            for field in fields
+        ))
+    return "\n".join(lines)
@@ -0,0 +1,53 @@
+import re
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Iterable, List, Optional
+
+# Title patterns, compiled once, in the order their matches are reported
+TITLE_PATTERNS = [
+    re.compile(pattern, re.IGNORECASE)
+    for pattern in (
+        r'"([^"]+)"',
+        r"'([^']+)'",
+        r'《([^》]+)》',
+        r'Title[：:]\s*([^\n\r,，]+)',
+        r'(\d+\.\s*[^\n\r]+)',
+    )
+]
+
+
+def extract_titles(text: str, limit: Optional[int] = 10, min_length: int = 4) -> List[str]:
+    """Extract candidate book titles from recommendation text.
+
+    Titles are reported pattern by pattern, in match order, with duplicates
+    dropped through an ordered dict. Matching stops as soon as `limit`
+    distinct titles have been found, so later patterns and the rest of the
+    text are not scanned at all."""
+    titles = {}
+    for pattern in TITLE_PATTERNS:
+        for match in pattern.finditer(text):
+            title = match.group(1).strip().replace('\n', ' ')
+            if len(title) >= min_length and title not in titles:
+                titles[title] = None
+                if limit is not None and len(titles) >= limit:
+                    return list(titles)
+    return list(titles)
+
+
+def _extract_chunk(texts, limit=10):
+    return [extract_titles(text, limit=limit) for text in texts]
+
+
+def extract_titles_batch(texts: Iterable[str], processes: Optional[int] = None,
+                         chunksize: int = 256, limit: Optional[int] = 10) -> List[List[str]]:
+    """Extract at most `limit` titles from each of many texts, optionally spread across a process pool.
+
+    With processes=None or 1 the work runs in the calling process, which is
+    faster for small batches where pool start-up would dominate."""
+    texts = list(texts)
+    if not processes or processes <= 1 or len(texts) <= chunksize:
+        return _extract_chunk(texts, limit)
+
+    chunks = [texts[i:i + chunksize] for i in range(0, len(texts), chunksize)]
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        return [titles for chunk in pool.map(partial(_extract_chunk, limit=limit), chunks) for titles in chunk]
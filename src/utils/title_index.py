@@ -0,0 +1,119 @@
+import re
+import unicodedata
+from collections import Counter
+
+LEADING_ARTICLES = ("the ", "a ", "an ")
+NON_WORD_PATTERN = re.compile(r"[\W_]+")
+
+
+def normalize_title(title):
+    """Casefold a title, strip accents, punctuation and a leading article."""
+    if not isinstance(title, str):
+        return ""
+    text = unicodedata.normalize("NFKD", title)
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    text = NON_WORD_PATTERN.sub(" ", text.casefold()).strip()
+    for article in LEADING_ARTICLES:
+        if text.startswith(article):
+            text = text[len(article):]
+            break
+    return text
+
+
+def title_trigrams(normalized):
+    padded = f"  {normalized} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TitleIndex:
+    """Fuzzy lookup of book titles.
+
+    Titles are normalized (casefolded, accents, punctuation and leading
+    articles removed) and blocked by character trigram. A query only scores
+    titles that share its rarest trigrams, so a lookup touches a handful of
+    candidates regardless of how many titles are indexed."""
+
+    def __init__(self, titles=(), max_block_size=5000):
+        self.max_block_size = max_block_size
+        self.titles = []
+        self._normalized = []
+        self._trigrams = []
+        self._exact = {}
+        self._blocks = {}
+        for title in titles:
+            self.add(title)
+
+    def __len__(self):
+        return len(self.titles)
+
+    def add(self, title):
+        """Index a title and return its position."""
+        position = len(self.titles)
+        normalized = normalize_title(title)
+        grams = title_trigrams(normalized)
+        self.titles.append(title)
+        self._normalized.append(normalized)
+        self._trigrams.append(grams)
+        self._exact.setdefault(normalized, position)
+        for gram in grams:
+            self._blocks.setdefault(gram, []).append(position)
+        return position
+
+    def match(self, title, threshold=0.7, limit=5):
+        """Return up to `limit` (title, score) pairs with Jaccard trigram similarity >= threshold, best first."""
+        normalized = normalize_title(title)
+        if not normalized:
+            return []
+        exact = self._exact.get(normalized)
+        if exact is not None and limit == 1:
+            return [(self.titles[exact], 1.0)]
+
+        grams = title_trigrams(normalized)
+        blocks = sorted((self._blocks[gram] for gram in grams if gram in self._blocks), key=len)
+        # Very common trigrams (" th", "ion") say little and would pull in most
+        # of the catalog; probe with the rarer ones when there are enough of them
+        selective = [block for block in blocks if len(block) <= self.max_block_size]
+        if len(selective) >= max(1, len(grams) // 3):
+            blocks = selective
+
+        shared = Counter()
+        for block in blocks:
+            shared.update(block)
+
+        scored = []
+        for position, _ in shared.most_common(limit * 10):
+            candidate = self._trigrams[position]
+            score = len(grams & candidate) / len(grams | candidate)
+            if score >= threshold:
+                scored.append((score, position))
+
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        results, seen = [], set()
+        if exact is not None:
+            results.append((self.titles[exact], 1.0))
+            seen.add(exact)
+        for score, position in scored:
+            if position not in seen and len(results) < limit:
+                results.append((self.titles[position], score))
+                seen.add(position)
+        return results
+
+    def containing(self, title):
+        """Return the first title that contains `title` as whole words after normalization, else None.
+
+        "Gatsby" finds "The Great Gatsby". Every trigram of " gatsby " occurs in
+        such a title, so only the rarest trigram's block is scanned."""
+        normalized = normalize_title(title)
+        if not normalized:
+            return None
+        padded = f" {normalized} "
+        blocks = [self._blocks.get(padded[i:i + 3], []) for i in range(len(padded) - 2)]
+        for position in min(blocks, key=len):
+            if padded in f" {self._normalized[position]} ":
+                return self.titles[position]
+        return None
+
+    def best_match(self, title, threshold=0.7):
+        """Return the closest (title, score) pair, or None when nothing reaches the threshold."""
+        matches = self.match(title, threshold=threshold, limit=1)
+        return matches[0] if matches else None
@@ -0,0 +1,214 @@
+import json
+import os
+import re
+import threading
+import time
+from collections import Counter
+
+# Filler words that do not change what a reader is asking about
+TOPIC_STOPWORDS = {
+    "a", "an", "the", "and", "of", "to", "for", "in", "on", "about",
+    "intro", "introduction", "introductory", "basic", "basics", "beginner",
+    "beginners", "fundamentals", "guide", "book", "books"
+}
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def normalize_topic(topic):
+    """Casefold a topic and drop punctuation and filler words."""
+    words = WORD_PATTERN.findall(str(topic).casefold())
+    kept = [word for word in words if word not in TOPIC_STOPWORDS]
+    return " ".join(kept or words)
+
+
+def char_ngrams(text, n=3):
+    padded = f" {text} "
+    return {padded[i:i + n] for i in range(max(len(padded) - n + 1, 1))}
+
+
+def ngram_similarity(first, second):
+    """Jaccard similarity of two character n-gram sets."""
+    if not first or not second:
+        return 0.0
+    return len(first & second) / len(first | second)
+
+
+def acronym(text):
+    return "".join(word[0] for word in text.split())
+
+
+def numbers(text):
+    # Editions, volumes and years tell topics apart however similar the rest is
+    return {word for word in text.split() if word.isdigit()}
+
+
+class TopicCache:
+    """Topic-level cache of recommend_books results.
+
+    Topics are normalized before lookup. A miss on the exact key falls back to
+    character trigram similarity against the stored topics, so near-duplicate
+    phrasings share one result. Acronyms written in uppercase ("ML basics")
+    are expanded when exactly one stored topic has them, and the expansion
+    must pass the same threshold. Topics with different numbers never match.
+    Entries older than ``ttl_seconds`` are dropped on lookup. When ``path`` is
+    given, entries are persisted as JSON."""
+
+    def __init__(self, threshold=0.8, path=None, max_entries=10000, ttl_seconds=None):
+        self.threshold = threshold
+        self.path = path
+        self.max_entries = max_entries
+        # None keeps entries until they are evicted or invalidated
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._stored_at = {}
+        self._ngrams = {}
+        # Trigram -> normalized topics containing it, used to pick candidates
+        self._blocks = {}
+        self._acronyms = {}
+        self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+            if "entries" not in data:
+                # Files written before entries were timestamped
+                data = {"entries": data, "stored_at": {}}
+            now = time.time()
+            for key, value in data["entries"].items():
+                self._index(key, value, data["stored_at"].get(key, now))
+        except Exception as e:
+            print(f"Error loading topic cache: {e}")
+
+    def _persist(self):
+        if not self.path:
+            return
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump({"entries": self._entries, "stored_at": self._stored_at}, file, ensure_ascii=False)
+        os.replace(temp_path, self.path)
+
+    def _index(self, key, value, stored_at=None):
+        self._entries[key] = value
+        self._stored_at[key] = time.time() if stored_at is None else stored_at
+        grams = char_ngrams(key)
+        self._ngrams[key] = grams
+        for gram in grams:
+            self._blocks.setdefault(gram, set()).add(key)
+        if " " in key:
+            self._acronyms.setdefault(acronym(key), set()).add(key)
+
+    def _forget(self, key):
+        self._entries.pop(key, None)
+        self._stored_at.pop(key, None)
+        for gram in self._ngrams.pop(key, ()):
+            keys = self._blocks.get(gram)
+            if keys:
+                keys.discard(key)
+        keys = self._acronyms.get(acronym(key))
+        if keys:
+            keys.discard(key)
+
+    def _expansions(self, key, topic):
+        """Yield the key with one uppercase acronym of the raw topic spelled out, e.g. "ML basics"."""
+        words = key.split()
+        for word in set(WORD_PATTERN.findall(str(topic))):
+            if len(word) < 2 or not word.isupper():
+                continue
+            expanded = self._acronyms.get(word.casefold())
+            # Ambiguous acronyms ("ai": ancient india, artificial intelligence) are not expanded
+            if not expanded or len(expanded) != 1:
+                continue
+            expansion = next(iter(expanded))
+            yield " ".join(expansion if current == word.casefold() else current for current in words)
+
+    def _best_match(self, key):
+        grams = char_ngrams(key)
+        candidates = Counter()
+        for gram in grams:
+            candidates.update(self._blocks.get(gram, ()))
+        best_key, best_score = None, 0.0
+        for candidate, _ in candidates.most_common(20):
+            if numbers(candidate) != numbers(key):
+                continue
+            score = ngram_similarity(grams, self._ngrams[candidate])
+            if score > best_score:
+                best_key, best_score = candidate, score
+        return best_key, best_score
+
+    def _match(self, key, topic=None):
+        if key in self._entries:
+            return key, 1.0
+
+        best_key, best_score = self._best_match(key)
+        for expanded in self._expansions(key, key if topic is None else topic):
+            if expanded in self._entries:
+                return expanded, 1.0
+            candidate, score = self._best_match(expanded)
+            if score > best_score:
+                best_key, best_score = candidate, score
+        if best_score >= self.threshold:
+            return best_key, best_score
+        return None, best_score
+
+    def _expired(self, key):
+        return self.ttl_seconds is not None and time.time() - self._stored_at.get(key, 0.0) > self.ttl_seconds
+
+    def get(self, topic):
+        """Return the cached result for a topic or a near-duplicate of it, else None."""
+        key = normalize_topic(topic)
+        with self._lock:
+            match, score = self._match(key, topic)
+            if match is not None and self._expired(match):
+                self._forget(match)
+                self._persist()
+                match, score = self._match(key, topic)
+            if match is None:
+                self.misses += 1
+                return None
+            if match == key:
+                self.hits += 1
+            else:
+                self.near_hits += 1
+            # Refresh recency so eviction drops the oldest unused topics first
+            value = self._entries.pop(match)
+            self._entries[match] = value
+            return value
+
+    def put(self, topic, result):
+        key = normalize_topic(topic)
+        with self._lock:
+            self._forget(key)
+            self._index(key, result)
+            while len(self._entries) > self.max_entries:
+                self._forget(next(iter(self._entries)))
+            self._persist()
+
+    def invalidate(self, topic=None):
+        """Drop the entry stored for a topic (exact normalized match), or every entry. Returns the count removed."""
+        with self._lock:
+            keys = list(self._entries) if topic is None else [normalize_topic(topic)]
+            removed = 0
+            for key in keys:
+                if key in self._entries:
+                    self._forget(key)
+                    removed += 1
+            if removed:
+                self._persist()
+            return removed
+
+    def stats(self):
+        lookups = self.hits + self.near_hits + self.misses
+        return {
+            "hits": self.hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.near_hits) / lookups if lookups else 0.0,
+            "entries": len(self._entries)
+        }
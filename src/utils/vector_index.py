@@ -0,0 +1,240 @@
+import argparse
+import json
+import os
+import zlib
+
+import numpy as np
+import pandas as pd
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    SentenceTransformer = None
+
+from src.utils.catalog_index import CatalogIndex, TOKEN_PATTERN
+from src.utils.file_lock import FileLock
+
+DEFAULT_ENCODER = "hashed"
+# Rows encoded per pass; bounds the memory of the expanded (row, feature) pairs
+ENCODE_CHUNK_ROWS = 16_384
+
+
+class HashedNgramEncoder:
+    """Embeds text as signed feature-hashed words and character n-grams.
+
+    Every word contributes its own feature plus the n-grams of "<word>", so
+    inflections and compounds ("ethic", "ethics", "ethical") land close to each
+    other without any model download. Vectors are L2-normalized, so a dot
+    product is their cosine similarity."""
+
+    def __init__(self, dimensions=256, ngram_range=(3, 5), max_cached_tokens=200_000):
+        self.dimensions = dimensions
+        self.ngram_range = ngram_range
+        self.name = f"hashed-ngrams-{dimensions}-{ngram_range[0]}-{ngram_range[1]}"
+        # token -> (buckets, values); bounded so huge vocabularies cannot exhaust memory
+        self.max_cached_tokens = max_cached_tokens
+        self._features = {}
+
+    def _hash(self, feature):
+        value = zlib.crc32(feature.encode("utf-8"))
+        # The low bits pick the bucket, the next bit the sign, so collisions tend to cancel out
+        return value % self.dimensions, 1.0 if (value // self.dimensions) & 1 else -1.0
+
+    def _token_features(self, token):
+        features = self._features.get(token)
+        if features is not None:
+            return features
+        marked = f"<{token}>"
+        grams = [
+            marked[start:start + size]
+            for size in range(self.ngram_range[0], self.ngram_range[1] + 1)
+            for start in range(len(marked) - size + 1)
+        ]
+        # The whole word and its n-grams contribute equal norms, so partial overlaps still count
+        weighted = [(f"w:{token}", 1.0)] + [(gram, 1.0 / np.sqrt(len(grams))) for gram in grams]
+        buckets, values = [], []
+        for feature, weight in weighted:
+            bucket, sign = self._hash(feature)
+            buckets.append(bucket)
+            values.append(sign * weight)
+        features = (np.array(buckets, dtype=np.int64), np.array(values, dtype=np.float32))
+        if len(self._features) < self.max_cached_tokens:
+            self._features[token] = features
+        return features
+
+    def encode(self, texts):
+        """Return a (len(texts), dimensions) float32 matrix of unit-length rows (zero for empty texts)."""
+        texts = pd.Series(list(texts), dtype=object)
+        matrix = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for start in range(0, len(texts), ENCODE_CHUNK_ROWS):
+            chunk = texts.iloc[start:start + ENCODE_CHUNK_ROWS].reset_index(drop=True)
+            tokens = chunk.fillna("").astype(str).str.lower().str.findall(TOKEN_PATTERN.pattern).explode().dropna()
+            if tokens.empty:
+                continue
+            codes, vocabulary = pd.factorize(tokens.to_numpy())
+            features = [self._token_features(token) for token in vocabulary]
+            lengths = np.array([len(buckets) for buckets, _ in features], dtype=np.int64)
+            offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+            all_buckets = np.concatenate([buckets for buckets, _ in features])
+            all_values = np.concatenate([values for _, values in features])
+
+            # Expand every (row, token) pair into that token's (bucket, value) features
+            pair_lengths = lengths[codes]
+            total = int(pair_lengths.sum())
+            pair_starts = np.repeat(np.cumsum(pair_lengths) - pair_lengths, pair_lengths)
+            positions = np.arange(total) - pair_starts + np.repeat(offsets[codes], pair_lengths)
+            rows = np.repeat(tokens.index.to_numpy(dtype=np.int64), pair_lengths)
+            flat = np.bincount(
+                rows * self.dimensions + all_buckets[positions],
+                weights=all_values[positions],
+                minlength=len(chunk) * self.dimensions
+            )
+            matrix[start:start + len(chunk)] = flat.reshape(len(chunk), self.dimensions)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        return matrix
+
+
+class SentenceTransformerEncoder:
+    """Embeds text with a local sentence-transformers model (e.g. all-MiniLM-L6-v2) on the CPU.
+
+    Unlike hashed n-grams, it also relates different words with the same
+    meaning ("AI ethics" and "machine morality")."""
+
+    def __init__(self, model_name="all-MiniLM-L6-v2", batch_size=256, device="cpu"):
+        if SentenceTransformer is None:
+            raise ImportError("SentenceTransformerEncoder requires sentence-transformers (pip install sentence-transformers)")
+        self.model = SentenceTransformer(model_name, device=device)
+        self.batch_size = batch_size
+        self.dimensions = self.model.get_sentence_embedding_dimension()
+        self.name = f"sentence-transformers/{model_name}"
+
+    def encode(self, texts):
+        texts = ["" if text is None or (isinstance(text, float) and np.isnan(text)) else str(text) for text in texts]
+        if not texts:
+            return np.zeros((0, self.dimensions), dtype=np.float32)
+        return self.model.encode(
+            texts, batch_size=self.batch_size, normalize_embeddings=True, convert_to_numpy=True
+        ).astype(np.float32)
+
+
+def create_encoder(name=DEFAULT_ENCODER):
+    """Build an encoder from a name: "hashed", "hashed:512" or a sentence-transformers model name."""
+    if name == "hashed" or name.startswith("hashed:"):
+        dimensions = int(name.split(":", 1)[1]) if ":" in name else 256
+        return HashedNgramEncoder(dimensions=dimensions)
+    return SentenceTransformerEncoder(name.split("/", 1)[1] if name.startswith("sentence-transformers/") else name)
+
+
+class VectorIndex:
+    """Catalog embeddings precomputed into a memory-mapped float32 matrix.
+
+    Row i of `<catalog>.vectors` embeds row i of the CSV; `<catalog>.vectors.json`
+    records the encoder, the row count and the (mtime, size) of the CSV the
+    matrix matches. A matrix that does not match is rebuilt on first use, and
+    rows appended to the CSV are encoded and appended to the matrix in place.
+    Every process maps the same file, sharing one copy through the page cache."""
+
+    def __init__(self, library_path, encoder=None, vectors_path=None):
+        self.library_path = library_path
+        self.encoder = encoder or create_encoder()
+        self.vectors_path = vectors_path or f"{os.path.splitext(library_path)[0]}.vectors"
+        self.meta_path = f"{self.vectors_path}.json"
+
+    def _read_meta(self):
+        try:
+            with open(self.meta_path, "r", encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, rows, signature):
+        meta = {
+            "encoder": self.encoder.name,
+            "dimensions": self.encoder.dimensions,
+            "rows": rows,
+            "source_signature": list(signature) if signature else None
+        }
+        temp_path = f"{self.meta_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(meta, file)
+        os.replace(temp_path, self.meta_path)
+
+    def _matches(self, meta, rows=None, signature=None):
+        if not meta or meta.get("encoder") != self.encoder.name or meta.get("dimensions") != self.encoder.dimensions:
+            return False
+        if rows is not None and meta.get("rows") != rows:
+            return False
+        if signature is not None and meta.get("source_signature") != list(signature):
+            return False
+        # A crash between writing rows and metadata leaves a file of the wrong size
+        try:
+            return os.path.getsize(self.vectors_path) == meta["rows"] * meta["dimensions"] * 4
+        except OSError:
+            return False
+
+    def _map(self, rows):
+        if rows == 0:
+            return np.zeros((0, self.encoder.dimensions), dtype=np.float32)
+        return np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(rows, self.encoder.dimensions))
+
+    def build(self, texts, signature):
+        """Encode every catalog text and replace the matrix atomically."""
+        texts = list(texts)
+        temp_path = f"{self.vectors_path}.tmp"
+        with open(temp_path, "wb") as file:
+            for start in range(0, len(texts), ENCODE_CHUNK_ROWS):
+                file.write(self.encoder.encode(texts[start:start + ENCODE_CHUNK_ROWS]).tobytes())
+        os.replace(temp_path, self.vectors_path)
+        self._write_meta(len(texts), signature)
+
+    def load(self, texts, rows, signature):
+        """Return the (rows, dimensions) matrix for the catalog with this signature, building it if needed.
+
+        `texts` is called for the catalog texts only when the matrix has to be (re)built."""
+        if signature is None:
+            # The catalog changed while it was being read; serve this load from memory
+            return self.encoder.encode(texts())
+        if not self._matches(self._read_meta(), rows, signature):
+            with FileLock(self.vectors_path):
+                if not self._matches(self._read_meta(), rows, signature):
+                    print(f"🧭 Building catalog vectors {self.vectors_path}...")
+                    self.build(texts(), signature)
+        return self._map(rows)
+
+    def append(self, texts, previous_signature, signature):
+        """Encode rows just appended to the CSV and append them to the matrix.
+
+        Only done when the matrix matches the CSV as it was before the append
+        (`previous_signature`); otherwise it is left to be rebuilt on next load.
+        Returns the new row count, or None when nothing was appended."""
+        with FileLock(self.vectors_path):
+            meta = self._read_meta()
+            if previous_signature is None or not self._matches(meta, signature=previous_signature):
+                return None
+            vectors = self.encoder.encode(texts)
+            with open(self.vectors_path, "ab") as file:
+                file.write(vectors.tobytes())
+            rows = meta["rows"] + len(vectors)
+            self._write_meta(rows, signature)
+            return rows
+
+    def open(self, rows):
+        """Map the first `rows` rows of the current matrix."""
+        return self._map(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute the semantic search vectors of a CSV library catalog.")
+    parser.add_argument("csv_path", help="CSV catalog, e.g. data/lite_library.csv")
+    parser.add_argument("--model", default=DEFAULT_ENCODER,
+                        help='"hashed" (default), "hashed:512" or a sentence-transformers model name')
+    args = parser.parse_args()
+
+    catalog = CatalogIndex(args.csv_path, vectors=VectorIndex(args.csv_path, create_encoder(args.model)))
+    vectors = catalog.vector_matrix()
+    print(f"{len(vectors)} vectors of {vectors.shape[1]} dimensions in {catalog.vectors.vectors_path}")
+
+
+if __name__ == "__main__":
+    main()